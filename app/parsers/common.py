@@ -32,7 +32,7 @@ def extract_date(date_str: str) -> dt.date:
         date.
     """
     date_str = date_str.strip()
-    for pattern in ["%b %d, %Y", "%Y-%m-%d"]:
+    for pattern in ["%b %d, %Y", "%Y-%m-%d", "%b / %d / %Y"]:
         try:
             return dt.datetime.strptime(date_str, pattern).date()
         except Exception:  # pylint: disable=broad-except
@@ -1,9 +1,13 @@
 """Parses html from sherdog.com.
 Extracts events and fights data.
+
+Extractors take either the content of a page or its document
+built by parse_document, so a page needed by a few extractors
+is parsed only once.
 """
 import datetime as dt
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 import hashlib
 import re
@@ -14,6 +18,30 @@ import pandas as pd
 
 from app.parsers import common
 
+# Content of a page, or its already built document
+Document = Union[str, bytes, BeautifulSoup]
+
+# Fighter pages don't list where a fight was on its card. Main events
+# are recognized by the title, other fights get the first position
+# after the main event, since profiles are linked mostly for top fights.
+HISTORY_POSITION = 2
+
+
+def parse_document(content: Document) -> BeautifulSoup:
+    """Builds the document tree of a page. Building it is most of
+    the cost of parsing, so a tree that's already built is returned
+    as is.
+
+    Args:
+        content (Document): page content or its document.
+
+    Returns:
+        BeautifulSoup: document of the page.
+    """
+    if isinstance(content, BeautifulSoup):
+        return content
+    return BeautifulSoup(content, "lxml")
+
 
 def combine_data(fights: pd.DataFrame, fighters: pd.DataFrame) -> pd.DataFrame:
     """Adds figter and opponent statistcs to a given fight.
@@ -49,18 +77,18 @@ def combine_data(fights: pd.DataFrame, fighters: pd.DataFrame) -> pd.DataFrame:
     return merged
 
 
-def extract_fighter_info(content: Optional[str], url: str) -> Dict[str, Any]:
+def extract_fighter_info(content: Optional[Document], url: str) -> Dict[str, Any]:
     """Extracts fighter information from website content.
 
     Args:
-        content (Optional[str]): website content.
+        content (Optional[Document]): website content or its document.
         url (str): url of the website.
 
     Returns:
         Dict[str, Any]: data about the fighter.
     """
     try:
-        soup = BeautifulSoup(content, "lxml")
+        soup = parse_document(content)
         data: Dict[str, Any] = {"fighter": url}
         data["birth"] = None
         birth_elem = soup.find("span", {"itemprop": "birthDate"})
@@ -88,12 +116,12 @@ def extract_fighter_info(content: Optional[str], url: str) -> Dict[str, Any]:
         raise err
 
 
-def extract_fights(content: Optional[str], url: str) -> List[Dict[str, Any]]:
+def extract_fights(content: Optional[Document], url: str) -> List[Dict[str, Any]]:
     """Takes a content of an event page and
     extracts all fights data from it.
 
     Args:
-        content (str): web page content.
+        content (Optional[Document]): web page content or its document.
         url (str): web page url.
 
     Returns:
@@ -101,10 +129,11 @@ def extract_fights(content: Optional[str], url: str) -> List[Dict[str, Any]]:
     """
     if not content:
         return []
-    event = extract_event_data(content, url)
+    soup = parse_document(content)
+    event = extract_event_data(soup, url)
     if not event or not event["date"] or event["date"] >= dt.date.today():
         return []
-    fights = _extract_fights_from_event(content)
+    fights = _extract_fights_from_event(soup)
     # Add event info to the fights
     for fight in fights:
         fight["url"] = url
@@ -116,12 +145,12 @@ def extract_fights(content: Optional[str], url: str) -> List[Dict[str, Any]]:
     return fights
 
 
-def extract_events_links(content: Optional[str], url: str) -> List[str]:
+def extract_events_links(content: Optional[Document], url: str) -> List[str]:
     """Takes a events list page and extracts
     events links from it.
 
     Args:
-        content (str): web page content.
+        content (Optional[Document]): web page content or its document.
         url (str): web page URL.
 
     Returns:
@@ -131,7 +160,7 @@ def extract_events_links(content: Optional[str], url: str) -> List[str]:
         return []
     parsed_uri = urlparse(url)
     domain = "{uri.scheme}://{uri.netloc}".format(uri=parsed_uri)
-    soup = BeautifulSoup(content, "lxml")
+    soup = parse_document(content)
     links = soup.find_all("a", href=re.compile("events"))
     events = {domain + link["href"] for link in links}
     events = {link for link in events if "events/" in link}
@@ -140,6 +169,56 @@ def extract_events_links(content: Optional[str], url: str) -> List[str]:
     return sorted(list(events))
 
 
+def extract_fighter_fights(
+    content: Optional[Document], url: str
+) -> List[Dict[str, Any]]:
+    """Takes a content of a fighter page and extracts fights
+    from the fighter's history. Fights are seen from the side of
+    the winner, like on event pages, so they get the same ids.
+    Organization and location are not listed on fighter pages,
+    so they're None. Position of the fight within its event
+    isn't listed either, see HISTORY_POSITION.
+
+    Args:
+        content (Optional[Document]): web page content or its document.
+        url (str): web page url.
+
+    Returns:
+        List[Dict[str, Any]]: list of fights.
+    """
+    if not content:
+        return []
+    soup = parse_document(content)
+    history = soup.find("div", {"class": "fight_history"})
+    if not history:
+        return []
+    parsed_uri = urlparse(url)
+    domain = "{uri.scheme}://{uri.netloc}".format(uri=parsed_uri)
+    # Same as ids of fighters linked from event pages
+    fighter = "http://www.sherdog.com" + parsed_uri.path
+    fights = []
+    for row in history.find_all("tr", {"class": ["odd", "even"]}):
+        fight = _create_history_fight(row, fighter, domain)
+        if fight:
+            fights.append(fight)
+    return fights
+
+
+def fight_ids(fight: Dict[str, Any]) -> Tuple[str, str]:
+    """Creates ids of a fight seen from both sides, as it's not
+    always known which side an event page lists first.
+
+    Args:
+        fight (Dict[str, Any]): fight data.
+
+    Returns:
+        Tuple[str, str]: id of the fight, and of the fight
+            with fighter and opponent swapped.
+    """
+    swapped = dict(fight, fighter=fight["opponent"], opponent=fight["fighter"])
+    return _create_fight_id(fight), _create_fight_id(swapped)
+
+
 def _create_fight_id(fight: Dict[str, Any]) -> str:
     raw_id = (
         fight["fighter"]
@@ -151,16 +230,16 @@ def _create_fight_id(fight: Dict[str, Any]) -> str:
     return result.hexdigest()
 
 
-def extract_event_data(content: str, url: str) -> Dict[str, Any]:
+def extract_event_data(content: Document, url: str) -> Dict[str, Any]:
     """Extracts data about the event.
 
     Args:
-        content (str): event page html.
+        content (Document): event page html or its document.
 
     Returns:
         dict: event information.
     """
-    soup = BeautifulSoup(content, "lxml")
+    soup = parse_document(content)
     title = soup.find("h1")
     if not title:
         return {}
@@ -181,9 +260,8 @@ def extract_event_data(content: str, url: str) -> Dict[str, Any]:
     return data
 
 
-def _extract_fights_from_event(content: str) -> List[Dict[str, Any]]:
+def _extract_fights_from_event(soup: BeautifulSoup) -> List[Dict[str, Any]]:
     fights: List[Optional[Dict[str, Any]]] = []
-    soup = BeautifulSoup(content, "lxml")
     main_fight = _extract_main_fight_from_event(soup)
     fights.append(main_fight)
     other_fights = _extract_other_fights_from_event(soup)
@@ -242,6 +320,19 @@ def _create_fight(
     time_elem: Tag,
     position: Tag,
 ) -> Optional[Dict[str, Any]]:
+    data: Dict[str, Any] = _extract_method(method_elem)
+    if not data:
+        return {}
+    data["result"] = common.remove_whitespace(result_elem.text).lower()
+    data["rounds"] = int(rounds_elem.text.replace("Round", ""))
+    data["time"] = _parse_time(time_elem.text, data["rounds"])
+    data["fighter"] = _extract_fighter_id(fighter_elem)
+    data["opponent"] = _extract_fighter_id(opponent_elem)
+    data["position"] = position
+    return data
+
+
+def _extract_method(method_elem: Tag) -> Dict[str, Any]:
     data: Dict[str, Any] = {}
     data["method"] = common.remove_whitespace(method_elem.text)
     data["method"] = data["method"].split("(")[0].lower()
@@ -253,15 +344,62 @@ def _create_fight(
     data["details"] = data["details"][0].replace("(", "")
     data["details"] = data["details"].replace(")", "")
     data["details"] = data["details"].lower()
-    data["result"] = common.remove_whitespace(result_elem.text).lower()
-    data["rounds"] = int(rounds_elem.text.replace("Round", ""))
+    return data
+
+
+def _create_history_fight(
+    row: Tag, fighter: str, domain: str
+) -> Optional[Dict[str, Any]]:
+    cells = row.find_all("td", recursive=False)
+    if len(cells) != 6:
+        return None
+    result_elem, opponent_elem, event_elem, method_elem, rounds_elem, time_elem = cells
+    result = result_elem.find("span", {"class": "final_result"})
+    event_link = event_elem.find("a")
+    date = event_elem.find("span", {"class": "sub_line"})
+    if not result or not event_link or not date:
+        return None
+    data = _extract_method(method_elem)
+    if not data:
+        return None
+    data["result"] = common.remove_whitespace(result.text).lower()
+    data["rounds"] = int(rounds_elem.text)
     data["time"] = _parse_time(time_elem.text, data["rounds"])
-    data["fighter"] = _extract_fighter_id(fighter_elem)
+    data["fighter"] = fighter
     data["opponent"] = _extract_fighter_id(opponent_elem)
-    data["position"] = position
+    if data["result"] == "loss":
+        # Event pages list the winner first
+        data["fighter"], data["opponent"] = data["opponent"], data["fighter"]
+        data["result"] = "win"
+    data["url"] = domain + event_link["href"]
+    # Event pages title events without the dash: "UFC 214 Cormier vs. Jones 2"
+    data["title"] = common.remove_whitespace(event_link.text).replace(" - ", " ", 1)
+    data["position"] = HISTORY_POSITION
+    if _is_main_event(data["title"], data["fighter"], data["opponent"]):
+        data["position"] = 1
+    data["organization"] = None
+    data["date"] = common.extract_date(date.text)
+    data["location"] = None
+    data["id"] = _create_fight_id(data)
     return data
 
 
+def _is_main_event(title: str, fighter: str, opponent: str) -> bool:
+    # Events are named after their main event, like "UFC 247 Jones vs. Reyes"
+    if " vs. " not in title:
+        return False
+    title = title.lower()
+    for fighter_id in [fighter, opponent]:
+        if fighter_id.startswith("http"):
+            # Url like /fighter/Jon-Jones-27944
+            name = fighter_id.rstrip("/").rsplit("/", 1)[-1].split("-")[:-1]
+        else:
+            name = fighter_id.split()
+        if not name or name[-1].lower() not in title:
+            return False
+    return True
+
+
 def _extract_fighter_id(elem: Tag) -> str:
     url = elem.find("a")["href"]
     base_url = "http://www.sherdog.com"
@@ -1,12 +1,19 @@
 """Provides domain specific functionality."""
 import logging
-from typing import Set
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import pandas as pd
 
 from app.tools import scraper, repository
+from app.tools.archive import HtmlArchive
+from app.tools.cache import ResponseCache
+from app.tools.frontier import CrawlFrontier
+from app.tools.metrics import RequestMetrics
+from app.tools.ratelimit import RateLimiter, RetryPolicy
 from app.parsers import sherdog
-from app.transformers.sherdog import Sequencer, Cumulator
+from app.transformers import export, streaming
+from app.transformers.incremental import IncrementalTransformer, transform_batch
 
 logging.basicConfig(
     format="[%(levelname)s %(asctime)s %(module)s:%(funcName)s] %(message)s",
@@ -14,78 +21,537 @@ logging.basicConfig(
     level=logging.INFO,
 )
 
+# Seconds responses stay fresh in the cache. Past events and fighters
+# rarely change, new events are added to listings every day.
+CACHE_TTLS = [
+    (r"/events/recent/", 24 * 3600.0),
+    (r"/events/", 30 * 24 * 3600.0),
+    (r"/fighter/", 7 * 24 * 3600.0),
+]
 
-def generate_event_listing_uris(start: int = 1, end: int = 500):
+# Seconds after which saved fighters are fetched again when refreshed.
+# Birth date, height and nationality almost never change.
+FIGHTER_TTL = 90 * 24 * 3600.0
+
+# Kinds of pages requests are measured by
+URL_KINDS = [
+    (r"/events/recent/", "listing"),
+    (r"/events/", "event"),
+    (r"/fighter/", "fighter"),
+]
+
+
+def generate_event_listing_uris(
+    start: int = 1, end: int = 500, base_url: str = "http://www.sherdog.com"
+):
     """Generates uris for listing pages where all events
     links are listed.
 
     Args:
         start (int, optional): which page to start. Defaults to 1.
         end (int, optional): which page to end. Defaults to 500.
+        base_url (str, optional): address of the site.
+            Defaults to "http://www.sherdog.com".
 
     Returns:
         List[str]: list of uris
     """
-    baseuri = "http://www.sherdog.com/events/recent/{}-page"
+    baseuri = base_url + "/events/recent/{}-page"
     return [baseuri.format(i) for i in range(start, end)]
 
 
-def extract_fights(repo: repository.AbstractRepository) -> None:
+def create_scraper(
+    cache: Optional[ResponseCache] = None,
+    frontier: Optional[CrawlFrontier] = None,
+    archive: Optional[HtmlArchive] = None,
+    parse_workers: int = 0,
+) -> scraper.Scraper:
+    """Creates a scraper for sherdog.com, which adapts its pace
+    to the site's responses and retries failed requests. Timings
+    of requests are summarized by URL_KINDS when it's closed.
+
+    Args:
+        cache: cache of responses, see CACHE_TTLS.
+        frontier: state of the crawl.
+        archive: archive of fetched pages.
+        parse_workers: number of processes parsing pages while the next
+            ones are fetched, 0 to parse them in the event loop.
+
+    Returns:
+        scraper.Scraper: scraper.
+    """
+    limiter = RateLimiter(
+        rate=10.0, burst=25, max_rate=20.0, concurrency=5, max_concurrency=25
+    )
+    return scraper.Scraper(
+        cache=cache,
+        limiter=limiter,
+        policy=RetryPolicy(),
+        frontier=frontier,
+        archive=archive,
+        parse_workers=parse_workers,
+        metrics=RequestMetrics(URL_KINDS),
+    )
+
+
+def load_frontier(
+    checkpoint: Optional[str], done: Set[str], retry_failed: bool = False
+) -> CrawlFrontier:
+    """Loads the state of an interrupted crawl, with pages
+    whose results are already in a repository marked as done.
+
+    Args:
+        checkpoint: path to the checkpoint file, None to keep
+            the state only in memory.
+        done: urls of pages already in the repository.
+        retry_failed: whether pages that failed in previous runs
+            are fetched again.
+
+    Returns:
+        CrawlFrontier: state of the crawl.
+    """
+    if checkpoint is None:
+        return CrawlFrontier(None, done)
+    return CrawlFrontier.load(checkpoint, done, retry_failed)
+
+
+def save_pages(
+    pages: Iterable[Tuple[str, List[Dict[str, Any]]]],
+    repo: repository.AbstractRepository,
+    chunk_size: int = 100,
+    frontier: Optional[CrawlFrontier] = None,
+    replace: bool = False,
+) -> int:
+    """Adds records of pages to the repository as they come,
+    committing them in chunks of whole pages. After every commit
+    the pages are marked as done in the crawl's checkpoint.
+
+    Args:
+        pages: urls of pages with their records.
+        repo: repository where data should be stored.
+        chunk_size: min number of records in a commit.
+        frontier: state of the crawl.
+        replace: whether records replace saved ones with the same id.
+
+    Returns:
+        int: number of saved records.
+    """
+    count = 0
+    uncommitted: List[str] = []
+    for url, records in pages:
+        for record in records:
+            if replace:
+                repo.replace(record)
+            else:
+                repo.add(record)
+        count += len(records)
+        uncommitted.append(url)
+        if count // chunk_size > (count - len(records)) // chunk_size:
+            commit_pages(uncommitted, repo, frontier)
+            uncommitted = []
+    if uncommitted:
+        commit_pages(uncommitted, repo, frontier)
+    return count
+
+
+def commit_pages(
+    urls: List[str],
+    repo: repository.AbstractRepository,
+    frontier: Optional[CrawlFrontier] = None,
+) -> None:
+    """Commits the repository and marks the pages as done.
+
+    Args:
+        urls: urls of pages whose records were added.
+        repo: repository where data should be stored.
+        frontier: state of the crawl.
+    """
+    repo.commit()
+    if frontier:
+        for url in urls:
+            frontier.finish(url)
+        frontier.checkpoint()
+
+
+def extract_fights(
+    repo: repository.AbstractRepository,
+    cache: Optional[ResponseCache] = None,
+    chunk_size: int = 100,
+    base_url: str = "http://www.sherdog.com",
+    checkpoint: Optional[str] = None,
+    incremental: bool = False,
+    overlap: int = 1,
+    archive: Optional[HtmlArchive] = None,
+    retry_failed: bool = False,
+    parse_workers: int = 0,
+) -> None:
     """Extracts fights and saves them in a specified filename.
+    Listing pages are fetched concurrently and events found in
+    them are fetched right away, while other listings are loaded.
+    Events already in the repository are skipped, and an interrupted
+    crawl resumes from its checkpoint.
+
+    In incremental mode listing pages are fetched newest first,
+    until a page lists only known events, so a regular refresh
+    needs just a few listing pages.
 
     Args:
         repo: repository that provides data persistance functionalities.
+        cache: cache of responses, see CACHE_TTLS.
+        chunk_size: number of fights saved in a commit.
+        base_url: address of the site.
+        checkpoint: path to the file with the state of the crawl.
+        incremental: whether to stop at the first page of known events.
+        overlap: number of listing pages checked after the first page
+            of known events, for results posted late.
+        archive: archive where fetched pages are stored.
+        retry_failed: whether pages that failed in previous runs
+            are fetched again.
+        parse_workers: number of processes parsing pages while the next
+            ones are fetched, 0 to parse them in the event loop.
     """
-    lists = generate_event_listing_uris(1, 500)
-    scraped: Set[str] = set()  # TODO: should contain scraped data
-    for listing_url in lists:
-        logging.info("Scraping %s", listing_url)
-        listing_content = scraper.get_content(listing_url)
-        events = sherdog.extract_events_links(listing_content, listing_url)
-        events = list(set(events).difference(set(scraped)))
-        if events:
-            results = scraper.run(events, sherdog.extract_fights, 25)
-            for result in results:
-                repo.add(result)
-        repo.commit()
+    lists = generate_event_listing_uris(1, 500, base_url)
+    frontier = load_frontier(checkpoint, repo.values("url"), retry_failed)
+    with create_scraper(cache, frontier, archive, parse_workers) as engine:
+        if incremental:
+            found = engine.discover_new(
+                lists, sherdog.extract_events_links, set(frontier.states), overlap
+            )
+        else:
+            found = engine.discover(lists, sherdog.extract_events_links, 5)
+        events = frontier.schedule(found)
+        pages = engine.pages(events, sherdog.extract_fights, 25)
+        count = save_pages(pages, repo, chunk_size, frontier)
+    logging.info("Saved %s fights, crawl state: %s", count, frontier.count())
+
+
+def backfill_fights(
+    repo: repository.AbstractRepository,
+    fighters: Optional[List[str]] = None,
+    cache: Optional[ResponseCache] = None,
+    chunk_size: int = 100,
+    fetch_events: bool = True,
+    archive: Optional[HtmlArchive] = None,
+    parse_workers: int = 0,
+) -> None:
+    """Adds fights missing in the repository from fight histories
+    on fighter pages. One fighter page lists all fights of a fighter,
+    so a backfill needs far fewer pages than one per event. Fights
+    already saved are recognized by their ids, from either side.
+
+    Organization and location are not listed on fighter pages. They're
+    taken from saved fights of the same event, and event pages are
+    requested only for events without any. Without fetching events,
+    fights of unknown events are saved without them. Either way their
+    urls are known afterwards, so extract_fights skips such events.
+
+    Args:
+        repo: repository with fights.
+        fighters: urls of fighter pages, by default fighters of saved fights.
+        cache: cache of responses, see CACHE_TTLS.
+        chunk_size: number of fights saved in a commit.
+        fetch_events: whether event pages are requested for events
+            without saved fights.
+        archive: archive where fetched pages are stored.
+        parse_workers: number of processes parsing pages while the next
+            ones are fetched, 0 to parse them in the event loop.
+    """
+    fighters = find_fighters(repo) if fighters is None else fighters
+    known = set(repo.values("id"))
+    locations = repo.mapping("url", "location")
+    events = {
+        url: (organization, locations.get(url))
+        for url, organization in repo.mapping("url", "organization").items()
+    }
+    missing: Dict[str, List[Dict[str, Any]]] = {}
+    with create_scraper(cache, archive=archive, parse_workers=parse_workers) as engine:
+        pages = engine.pages(fighters, sherdog.extract_fighter_fights, 25)
+        new = select_new_fights(pages, known, events, missing)
+        count = save_pages(new, repo, chunk_size)
+        logging.info("Saved %s fights from %s fighters", count, len(fighters))
+        if fetch_events and missing:
+            pages = engine.pages(list(missing), sherdog.extract_fights, 25)
+            count = save_pages(select_new_fights(pages, known), repo, chunk_size)
+            logging.info("Saved %s fights from %s events", count, len(missing))
+        # Fights of events not fetched, failed or not listing them
+        rest = [
+            (url, [fight for fight in fights if fight["id"] not in known])
+            for url, fights in missing.items()
+        ]
+        count = save_pages(select_new_fights(rest, known), repo, chunk_size)
+        if count:
+            logging.info("Saved %s fights without event data", count)
+
+
+def select_new_fights(
+    pages: Iterable[Tuple[str, List[Dict[str, Any]]]],
+    known: Set[str],
+    events: Optional[Dict[str, Tuple[Any, Any]]] = None,
+    missing: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> Iterable[Tuple[str, List[Dict[str, Any]]]]:
+    """Leaves only fights that are not known, seen from either side,
+    and adds them to the known ones. Given events, fights get the
+    organization and location of their event, and fights of other
+    events are set aside in missing instead, as they need event data.
+
+    Args:
+        pages: urls of pages with their fights.
+        known: ids of known fights.
+        events: organization and location of known events by url.
+        missing: fights waiting for event data by event url.
+
+    Yields:
+        Tuple[str, List[Dict[str, Any]]]: pages with new fights.
+    """
+    pending: Set[str] = set()
+    for url, fights in pages:
+        new = []
+        for fight in fights:
+            ids = sherdog.fight_ids(fight)
+            if known.intersection(ids) or pending.intersection(ids):
+                continue
+            if events is None:
+                known.update(ids)
+                new.append(fight)
+            elif fight["url"] in events:
+                fight["organization"], fight["location"] = events[fight["url"]]
+                known.update(ids)
+                new.append(fight)
+            elif missing is not None:
+                # Not known yet, so the event page can provide it
+                pending.update(ids)
+                missing.setdefault(fight["url"], []).append(fight)
+        yield url, new
 
 
-def extract_fighters(fighters: list, repo: repository.AbstractRepository) -> None:
+def extract_fighters(
+    fighters: list,
+    repo: repository.AbstractRepository,
+    cache: Optional[ResponseCache] = None,
+    chunk_size: int = 100,
+    checkpoint: Optional[str] = None,
+    archive: Optional[HtmlArchive] = None,
+    retry_failed: bool = False,
+    parse_workers: int = 0,
+) -> None:
     """Extracts fighters and saves them in a specified filename.
+    Fighters already in the repository are skipped, and an interrupted
+    crawl resumes from its checkpoint.
 
     Args:
         fighters (List[str]): list of fighters urls.
         filename (str): file name where data should be saved.
+        cache: cache of responses, see CACHE_TTLS.
+        chunk_size: number of fighters saved in a commit.
+        checkpoint: path to the file with the state of the crawl.
+        archive: archive where fetched pages are stored.
+        retry_failed: whether pages that failed in previous runs
+            are fetched again.
+        parse_workers: number of processes parsing pages while the next
+            ones are fetched, 0 to parse them in the event loop.
     """
-    for batch, i in scraper.batch(fighters, 100):
-        scraped: Set[str] = set()  # TODO: should contain scraped data
-        batch = list(set(batch).difference(set(scraped)))
-        logging.info("[%s:%s]: Scraping fighters.", i, len(fighters))
-        results = scraper.run(batch, sherdog.extract_fighter_info, 25)
-        for result in results:
-            repo.add(result)
-        repo.commit()
+    frontier = load_frontier(checkpoint, repo.values("fighter"), retry_failed)
+    with create_scraper(cache, frontier, archive, parse_workers) as engine:
+        links = frontier.schedule(fighters)
+        pages = engine.pages(links, sherdog.extract_fighter_info, 25)
+        count = save_pages(stamp_pages(pages), repo, chunk_size, frontier)
+    logging.info("Saved %s fighters, crawl state: %s", count, frontier.count())
+
+
+def refresh_fighters(
+    fights_repo: repository.AbstractRepository,
+    repo: repository.AbstractRepository,
+    ttl: float = FIGHTER_TTL,
+    cache: Optional[ResponseCache] = None,
+    chunk_size: int = 100,
+    archive: Optional[HtmlArchive] = None,
+    parse_workers: int = 0,
+) -> None:
+    """Fetches fighters of saved fights that are missing in the
+    repository, or were fetched longer than ttl ago. Refreshed
+    fighters replace their saved versions. An interrupted refresh
+    skips fighters saved before, as they're fresh by then.
+
+    Args:
+        fights_repo: repository with fights.
+        repo: repository with fighters.
+        ttl: seconds after which a fighter is fetched again.
+        cache: cache of responses, see CACHE_TTLS.
+        chunk_size: number of fighters saved in a commit.
+        archive: archive where fetched pages are stored.
+        parse_workers: number of processes parsing pages while the next
+            ones are fetched, 0 to parse them in the event loop.
+    """
+    fighters = find_fighters(fights_repo)
+    stale = find_stale_fighters(fighters, repo, ttl)
+    logging.info("Refreshing %s of %s fighters", len(stale), len(fighters))
+    with create_scraper(cache, archive=archive, parse_workers=parse_workers) as engine:
+        pages = engine.pages(stale, sherdog.extract_fighter_info, 25)
+        count = save_pages(stamp_pages(pages), repo, chunk_size, replace=True)
+    logging.info("Saved %s fighters, %s failed", count, len(engine.failed))
+
+
+def find_fighters(fights_repo: repository.AbstractRepository) -> List[str]:
+    """Lists unique urls of fighters and opponents in fights. Fighters
+    linked without a profile are identified only by name, so they're
+    left out.
+
+    Args:
+        fights_repo: repository with fights.
+
+    Returns:
+        List[str]: sorted urls of fighters.
+    """
+    fighters = fights_repo.values("fighter") | fights_repo.values("opponent")
+    return sorted(
+        fighter
+        for fighter in fighters
+        if isinstance(fighter, str) and fighter.startswith("http")
+    )
+
+
+def find_stale_fighters(
+    fighters: Iterable[str],
+    repo: repository.AbstractRepository,
+    ttl: float,
+    now: Optional[float] = None,
+) -> List[str]:
+    """Selects fighters that are missing in the repository, or were
+    fetched longer than ttl ago. Fighters saved without a fetch
+    time are stale.
+
+    Args:
+        fighters: urls of fighters.
+        repo: repository with fighters.
+        ttl: seconds after which a fighter is stale.
+        now: current timestamp, time.time() by default.
+
+    Returns:
+        List[str]: urls of fighters to fetch.
+    """
+    now = time.time() if now is None else now
+    fetched = repo.mapping("fighter", "fetched")
+    return [
+        fighter
+        for fighter in fighters
+        if fetched.get(fighter) is None or now - fetched[fighter] > ttl
+    ]
+
+
+def stamp_pages(
+    pages: Iterable[Tuple[str, List[Dict[str, Any]]]]
+) -> Iterable[Tuple[str, List[Dict[str, Any]]]]:
+    """Adds the time records were fetched to them, as a timestamp.
+
+    Args:
+        pages: urls of pages with their records.
+
+    Yields:
+        Tuple[str, List[Dict[str, Any]]]: the pages.
+    """
+    for url, records in pages:
+        fetched = time.time()
+        for record in records:
+            record["fetched"] = fetched
+        yield url, records
+
+
+def reparse_fights(
+    archive: HtmlArchive,
+    repo: repository.AbstractRepository,
+    chunk_size: int = 100,
+    workers: Optional[int] = None,
+) -> None:
+    """Extracts fights again from archived event pages, without
+    the network, for example after the parser was fixed.
+
+    Args:
+        archive: archive of fetched pages.
+        repo: repository where fights should be stored.
+        chunk_size: number of fights saved in a commit.
+        workers: number of parsing processes, one per core by default.
+    """
+    pages = archive.reparse(sherdog.extract_fights, r"/events/(?!recent/)", workers)
+    count = save_pages(pages, repo, chunk_size)
+    logging.info("Saved %s fights from %s archived pages", count, len(archive))
 
 
-def transform_fights(data: pd.DataFrame, repo: repository.AbstractRepository) -> None:
+def transform_fights(
+    data: pd.DataFrame, repo: repository.AbstractRepository, workers: int = 1
+) -> None:
     """From a sequence of n fight stats it creates
     fighters 2n (n for each fighter) results in time.
 
     Args:
         data: fights stats.
         repo: repository where data should be stored.
+        workers: number of processes building stats.
     """
-    sequencer = Sequencer()
-    cumulator = Cumulator()
-    # Calculate pre-fight stats
     data = data[data["result"].isin(["win", "loss"])]
-    sequences = sequencer.fit_transform(data)
-    # Exchange stats
-    exchanged = sequencer.exchange(sequences)
-    # Calculate cumulative stats
-    accumulated = cumulator.fit_transform(exchanged)
-    # Exchange stats
-    results = cumulator.exchange(accumulated)
+    results = transform_batch(data, workers)
     for result in results:
         repo.add(result)
     repo.commit()
+
+
+def stream_fights(
+    data: pd.DataFrame, repo: repository.AbstractRepository, size: int = 10000
+) -> None:
+    """Creates the same results as transform_fights, but saves them
+    in partitions of fighters, as soon as each partition is ready.
+
+    Args:
+        data: fights stats.
+        repo: repository where data should be stored.
+        size: number of results in a partition.
+    """
+    data = data[data["result"].isin(["win", "loss"])]
+    for i, partition in enumerate(streaming.iter_partitions(data, size)):
+        logging.info("Saving partition %s with %s results.", i, len(partition))
+        for result in partition:
+            repo.add(result)
+        repo.commit()
+
+
+def export_fights(data: pd.DataFrame, directory: str, size: int = 10000) -> int:
+    """Transforms fights and exports the results as a float32
+    feature matrix with labels, ready to be loaded for training.
+
+    Args:
+        data: fights stats.
+        directory: directory where features should be saved.
+        size: number of results transformed at once.
+
+    Returns:
+        int: number of exported results.
+    """
+    data = data[data["result"].isin(["win", "loss"])]
+    return export.export_features(streaming.iter_partitions(data, size), directory)
+
+
+def update_fights(
+    new: pd.DataFrame,
+    history: pd.DataFrame,
+    repo: repository.AbstractRepository,
+    state_path: str,
+) -> None:
+    """Transforms only newly added fights, starting from the saved
+    state of every fighter, and saves the updated state. Without
+    a saved state, all fights passed as new are transformed. Stats
+    recomputed after an out of order fight replace their saved
+    versions, matched by fight and fighter.
+
+    Args:
+        new: newly added fights stats.
+        history: all fights stats, including new ones.
+        repo: repository where data should be stored.
+        state_path: path to the file with fighters' state.
+    """
+    transformer = IncrementalTransformer.load(state_path)
+    new = new[new["result"].isin(["win", "loss"])]
+    history = history[history["result"].isin(["win", "loss"])]
+    for result in transformer.update(new, history):
+        # Stats recomputed after an out of order fight replace saved ones
+        repo.replace(result, ["id", "fighterid"])
+    repo.commit()
+    transformer.save(state_path)
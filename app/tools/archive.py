@@ -0,0 +1,217 @@
+"""Archive of raw pages fetched by the scraper, so data can be
+parsed again without the network. Pages are appended to segment
+files, each page as a separate gzip member, and found by url
+through an index of offsets.
+"""
+import functools
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Segments hold plain gzip members, not WARC records
+SEGMENT_SUFFIX = ".seg.gz"
+
+
+def read_record(path: str, offset: int, length: int) -> Tuple[str, bytes]:
+    """Reads a single page from a segment file.
+
+    Args:
+        path (str): segment file.
+        offset (int): position of the page's gzip member.
+        length (int): size of the compressed member.
+
+    Returns:
+        Tuple[str, bytes]: url and content of the page.
+    """
+    with open(path, "rb") as input_file:
+        input_file.seek(offset)
+        record = gzip.decompress(input_file.read(length))
+    header, body = record.split(b"\r\n\r\n", 1)
+    url = header.split(b"\r\n", 1)[0].decode()
+    return url, body
+
+
+def parse_record(entry: Tuple[str, int, int], func: Callable) -> Tuple[str, List[Any]]:
+    """Reads a page from a segment file and parses it using func.
+
+    Args:
+        entry (Tuple[str, int, int]): segment file, offset and length.
+        func (Callable): function that parses url content.
+
+    Returns:
+        Tuple[str, List[Any]]: url and its parsing results.
+    """
+    url, body = read_record(*entry)
+    result = func(body, url)
+    return url, result if isinstance(result, list) else [result]
+
+
+class HtmlArchive:
+    """Appends pages to compressed segment files in a directory.
+    Every page is stored with its url and fetch time in a separate
+    gzip member, so it can be read without decompressing the rest.
+    The index keeps the offset of the latest version of every url.
+    """
+
+    def __init__(self, directory: str, segment_size: int = 256 * 1024 * 1024) -> None:
+        """
+        Args:
+            directory (str): directory of the archive.
+            segment_size (int, optional): size in bytes after which a new
+                segment file is started. Defaults to 256 MB.
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        os.makedirs(directory, exist_ok=True)
+        self.index: Dict[str, Dict[str, Any]] = {}
+        index_path = os.path.join(directory, "index.jsonl")
+        if os.path.exists(index_path):
+            with open(index_path) as input_file:
+                for line in input_file:
+                    entry = json.loads(line)
+                    self.index[entry["url"]] = entry
+        segments = sorted(
+            name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX)
+        )
+        self.segment = len(segments) - 1 if segments else 0
+        self._segment_file: Optional[IO[bytes]] = None
+        self._index_file: Optional[IO[str]] = None
+
+    def __enter__(self) -> "HtmlArchive":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.index
+
+    def segment_path(self, segment: int) -> str:
+        """Returns path of a segment file."""
+        return os.path.join(self.directory, "{:05d}{}".format(segment, SEGMENT_SUFFIX))
+
+    def append(self, url: str, body: bytes) -> bool:
+        """Stores a page, unless the same content of the url
+        is already stored.
+
+        Args:
+            url (str): url of the page.
+            body (bytes): content of the page.
+
+        Returns:
+            bool: True if the page was stored.
+        """
+        digest = hashlib.sha1(body).hexdigest()
+        if self.index.get(url, {}).get("digest") == digest:
+            return False
+        fetched = time.time()
+        header = "{}\r\nFetched: {:.0f}\r\nContent-Length: {}\r\n\r\n".format(
+            url, fetched, len(body)
+        )
+        record = gzip.compress(header.encode() + body)
+        output_file = self._get_segment_file()
+        offset = output_file.tell()
+        output_file.write(record)
+        output_file.flush()
+        entry = {
+            "url": url,
+            "segment": self.segment,
+            "offset": offset,
+            "length": len(record),
+            "digest": digest,
+            "fetched": fetched,
+        }
+        if self._index_file is None:
+            self._index_file = open(os.path.join(self.directory, "index.jsonl"), "a")
+        self._index_file.write(json.dumps(entry) + "\n")
+        self._index_file.flush()
+        self.index[url] = entry
+        return True
+
+    def get(self, url: str) -> Optional[bytes]:
+        """Reads the latest stored content of a url.
+
+        Args:
+            url (str): url of the page.
+
+        Returns:
+            Optional[bytes]: content of the page, if stored.
+        """
+        entry = self.index.get(url)
+        if entry is None:
+            return None
+        return read_record(*self._locate(entry))[1]
+
+    def entries(self, pattern: Optional[str] = None) -> List[Tuple[str, int, int]]:
+        """Lists locations of pages, in the order they're stored.
+
+        Args:
+            pattern (Optional[str], optional): regex the urls must match.
+                Defaults to None, all pages.
+
+        Returns:
+            List[Tuple[str, int, int]]: segment file, offset and length.
+        """
+        regex = re.compile(pattern) if pattern else None
+        entries = sorted(
+            (entry for url, entry in self.index.items() if not regex or regex.search(url)),
+            key=lambda entry: (entry["segment"], entry["offset"]),
+        )
+        return [self._locate(entry) for entry in entries]
+
+    def reparse(
+        self, func: Callable, pattern: Optional[str] = None, workers: Optional[int] = None
+    ) -> Iterator[Tuple[str, List[Any]]]:
+        """Parses stored pages again across all cores, for example
+        after a parser was fixed.
+
+        Args:
+            func (Callable): function that parses url content, must be picklable.
+            pattern (Optional[str], optional): regex the urls must match.
+                Defaults to None, all pages.
+            workers (Optional[int], optional): number of processes.
+                Defaults to None, one per core.
+
+        Yields:
+            Tuple[str, List[Any]]: url and parsing results of every page.
+        """
+        self.flush()
+        entries = self.entries(pattern)
+        with ProcessPoolExecutor(workers) as pool:
+            parse = functools.partial(parse_record, func=func)
+            for result in pool.map(parse, entries, chunksize=16):
+                yield result
+
+    def flush(self) -> None:
+        """Writes buffered pages to disk."""
+        for output_file in [self._segment_file, self._index_file]:
+            if output_file is not None:
+                output_file.flush()
+
+    def close(self) -> None:
+        """Closes the segment and index files."""
+        for output_file in [self._segment_file, self._index_file]:
+            if output_file is not None:
+                output_file.close()
+        self._segment_file = None
+        self._index_file = None
+
+    def _get_segment_file(self) -> IO[bytes]:
+        if self._segment_file is None:
+            self._segment_file = open(self.segment_path(self.segment), "ab")
+        if self._segment_file.tell() >= self.segment_size:
+            self._segment_file.close()
+            self.segment += 1
+            self._segment_file = open(self.segment_path(self.segment), "ab")
+        return self._segment_file
+
+    def _locate(self, entry: Dict[str, Any]) -> Tuple[str, int, int]:
+        return self.segment_path(entry["segment"]), entry["offset"], entry["length"]
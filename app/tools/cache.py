@@ -0,0 +1,161 @@
+"""On-disk cache of http responses.
+Bodies are stored once under the hash of their content,
+entries with headers and fetch time under the hash of the url.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+
+class CachedResponse(NamedTuple):
+    """Response read from the cache."""
+
+    url: str
+    body: bytes
+    headers: Dict[str, str]
+    fetched: float
+
+
+class ResponseCache:
+    """Stores response bodies, headers and fetch times in a directory.
+    Entries younger than the TTL of their url are fresh and can be
+    used without a request. Stale entries are revalidated with
+    If-None-Match and If-Modified-Since headers.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttls: Optional[List[Tuple[str, float]]] = None,
+        default_ttl: float = 0.0,
+    ) -> None:
+        """
+        Args:
+            directory (str): directory where responses are stored.
+            ttls (Optional[List[Tuple[str, float]]], optional): url regex
+                patterns with seconds their responses stay fresh. The first
+                matching pattern is used. Defaults to None.
+            default_ttl (float, optional): seconds responses of other urls
+                stay fresh. Defaults to 0.0, so they're always revalidated.
+        """
+        self.directory = directory
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls or []]
+        self.default_ttl = default_ttl
+        os.makedirs(os.path.join(directory, "bodies"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "entries"), exist_ok=True)
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        """Reads the response of a url.
+
+        Args:
+            url (str): url address.
+
+        Returns:
+            Optional[CachedResponse]: cached response, if available.
+        """
+        path = self._entry_path(url)
+        if not os.path.exists(path):
+            return None
+        with open(path) as input_file:
+            entry = json.load(input_file)
+        body_path = self._body_path(entry["body"])
+        if not os.path.exists(body_path):
+            return None
+        with open(body_path, "rb") as input_file:
+            body = input_file.read()
+        return CachedResponse(url, body, entry["headers"], entry["fetched"])
+
+    def store(self, url: str, body: bytes, headers: Mapping[str, str]) -> None:
+        """Saves a response fetched now.
+
+        Args:
+            url (str): url address.
+            body (bytes): response content.
+            headers (Mapping[str, str]): response headers.
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        body_path = self._body_path(digest)
+        if not os.path.exists(body_path):
+            self._write(body_path, body)
+        entry = {
+            "url": url,
+            "body": digest,
+            "headers": dict(headers),
+            "fetched": time.time(),
+        }
+        self._write(self._entry_path(url), json.dumps(entry).encode())
+
+    def refresh(self, response: CachedResponse, headers: Mapping[str, str]) -> None:
+        """Marks a cached response as fetched now, after the origin
+        confirmed it didn't change.
+
+        Args:
+            response (CachedResponse): cached response.
+            headers (Mapping[str, str]): headers of the not modified response.
+        """
+        merged = dict(response.headers)
+        merged.update(headers)
+        self.store(response.url, response.body, merged)
+
+    def get_ttl(self, url: str) -> float:
+        """Finds seconds responses of a url stay fresh.
+
+        Args:
+            url (str): url address.
+
+        Returns:
+            float: time to live in seconds.
+        """
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def is_fresh(self, response: CachedResponse) -> bool:
+        """Checks if a cached response can be used without a request.
+
+        Args:
+            response (CachedResponse): cached response.
+
+        Returns:
+            bool: True if the response is younger than its TTL.
+        """
+        return time.time() - response.fetched < self.get_ttl(response.url)
+
+    @staticmethod
+    def validators(response: CachedResponse) -> Dict[str, str]:
+        """Creates headers of a conditional request, so the origin
+        responds with 304 if the page didn't change.
+
+        Args:
+            response (CachedResponse): cached response.
+
+        Returns:
+            Dict[str, str]: request headers.
+        """
+        headers = {key.lower(): value for key, value in response.headers.items()}
+        validators = {}
+        if "etag" in headers:
+            validators["If-None-Match"] = headers["etag"]
+        if "last-modified" in headers:
+            validators["If-Modified-Since"] = headers["last-modified"]
+        return validators
+
+    def _entry_path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, "entries", digest + ".json")
+
+    def _body_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "bodies", digest)
+
+    @staticmethod
+    def _write(path: str, content: bytes) -> None:
+        # Write to a temporary file first, so an interrupted
+        # write never leaves a truncated entry behind
+        temporary = "{}.{}.tmp".format(path, os.getpid())
+        with open(temporary, "wb") as output_file:
+            output_file.write(content)
+        os.replace(temporary, path)
@@ -0,0 +1,178 @@
+"""Keeps track of urls of a crawl, so an interrupted
+crawl can resume where it stopped.
+"""
+import json
+import logging
+import os
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+QUEUED = "queued"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+
+class CrawlFrontier:
+    """Records the state of every url: queued, in flight, done or
+    failed. Changes are appended to a checkpoint file when the crawl
+    saves its results, so done urls are never fetched again and urls
+    in flight during a crash are fetched again on resume.
+    """
+
+    def __init__(self, path: Optional[str] = None, done: Iterable[str] = ()) -> None:
+        """
+        Args:
+            path (Optional[str], optional): checkpoint file. Defaults to None,
+                so the state is kept only in memory.
+            done (Iterable[str], optional): urls already done, for example
+                found in a repository. Defaults to ().
+        """
+        self.path = path
+        self.states: Dict[str, str] = dict.fromkeys(done, DONE)
+        self.reasons: Dict[str, str] = {}
+        self.changes: List[Tuple[str, str, str]] = []
+
+    @classmethod
+    def load(
+        cls, path: str, done: Iterable[str] = (), retry_failed: bool = False
+    ) -> "CrawlFrontier":
+        """Loads the state of a crawl from its checkpoint file, if it
+        exists. Urls in flight during the last run are queued again.
+        The file is compacted to the current state of every url.
+
+        Args:
+            path (str): checkpoint file.
+            done (Iterable[str], optional): urls already done, for example
+                found in a repository. Defaults to ().
+            retry_failed (bool, optional): whether failed urls should be
+                queued again. Defaults to False.
+
+        Returns:
+            CrawlFrontier: frontier.
+        """
+        frontier = cls(path, done)
+        if os.path.exists(path):
+            with open(path) as input_file:
+                for line in input_file:
+                    url, state, reason = json.loads(line)
+                    if frontier.states.get(url) != DONE:
+                        frontier.states[url] = state
+                        frontier.reasons[url] = reason
+        for url, state in frontier.states.items():
+            if state == IN_FLIGHT or (retry_failed and state == FAILED):
+                frontier.states[url] = QUEUED
+        frontier.compact()
+        logging.info("Loaded crawl frontier: %s", frontier.count())
+        return frontier
+
+    def count(self) -> Dict[str, int]:
+        """Counts urls in every state.
+
+        Returns:
+            Dict[str, int]: number of urls by state.
+        """
+        counts = dict.fromkeys([QUEUED, IN_FLIGHT, DONE, FAILED], 0)
+        for state in self.states.values():
+            counts[state] += 1
+        return counts
+
+    def pending(self) -> List[str]:
+        """Lists queued urls, in the order they were added.
+
+        Returns:
+            List[str]: queued urls.
+        """
+        return [url for url, state in self.states.items() if state == QUEUED]
+
+    def add(self, url: str) -> bool:
+        """Queues a url, unless it's already known.
+
+        Args:
+            url (str): url address.
+
+        Returns:
+            bool: True if the url is new.
+        """
+        if url in self.states:
+            return False
+        self._set(url, QUEUED)
+        return True
+
+    def start(self, url: str) -> None:
+        """Marks a url as being fetched. Urls that weren't added,
+        like listing pages fetched on every run, are not tracked."""
+        if url in self.states:
+            self._set(url, IN_FLIGHT)
+
+    def finish(self, url: str) -> None:
+        """Marks a url as done, once its results are saved."""
+        if url in self.states:
+            self._set(url, DONE)
+
+    def fail(self, url: str, reason: str) -> None:
+        """Marks a url that couldn't be fetched."""
+        if url in self.states:
+            self._set(url, FAILED, reason)
+
+    async def schedule(
+        self, links: Union[Iterable[str], AsyncIterable[str]]
+    ) -> AsyncIterator[str]:
+        """Yields urls queued in previous runs, followed by new links.
+        Links that are already known are skipped.
+
+        Args:
+            links (Union[Iterable[str], AsyncIterable[str]]): found links.
+
+        Yields:
+            str: urls to fetch.
+        """
+        for url in self.pending():
+            yield url
+        if isinstance(links, AsyncIterable):
+            async for link in links:
+                if self.add(link):
+                    yield link
+        else:
+            for link in links:
+                if self.add(link):
+                    yield link
+
+    def checkpoint(self) -> None:
+        """Appends changes since the last checkpoint to the file."""
+        if self.path is None or not self.changes:
+            self.changes = []
+            return
+        with open(self.path, "a") as output_file:
+            for change in self.changes:
+                output_file.write(json.dumps(change) + "\n")
+            output_file.flush()
+            os.fsync(output_file.fileno())
+        self.changes = []
+
+    def compact(self) -> None:
+        """Rewrites the file with only the current state of every url.
+        Done urls are left out when they're known from elsewhere."""
+        self.changes = []
+        if self.path is None:
+            return
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as output_file:
+            for url, state in self.states.items():
+                if url in self.reasons or state != DONE:
+                    change = (url, state, self.reasons.get(url, ""))
+                    output_file.write(json.dumps(change) + "\n")
+        os.replace(temporary, self.path)
+
+    def _set(self, url: str, state: str, reason: str = "") -> None:
+        self.states[url] = state
+        self.reasons[url] = reason
+        self.changes.append((url, state, reason))
@@ -0,0 +1,239 @@
+"""Measures requests of the scraper. Timings of every phase of a
+request are taken from aiohttp tracing and grouped by the kind of
+the requested page, so slow crawls can be traced to their cause.
+"""
+import bisect
+import re
+import time
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+from typing import Any, DefaultDict, Dict, List, Optional, Tuple
+
+from aiohttp import ClientSession, TraceConfig
+
+PHASES = ("dns", "connect", "ttfb", "download", "total", "parse")
+
+
+class Histogram:
+    """Counts values in buckets growing exponentially, so
+    percentiles can be estimated in constant memory."""
+
+    def __init__(
+        self, start: float = 0.001, factor: float = 2 ** 0.5, size: int = 40
+    ) -> None:
+        """
+        Args:
+            start (float, optional): upper bound of the first bucket.
+                Defaults to 0.001.
+            factor (float, optional): ratio of bounds of consecutive buckets.
+                Defaults to square root of 2.
+            size (int, optional): number of buckets, values above the last
+                bound are counted in it. Defaults to 40.
+        """
+        self.bounds = [start * factor ** i for i in range(size)]
+        self.counts = [0] * size
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        """Counts a value."""
+        index = min(bisect.bisect_left(self.bounds, value), len(self.bounds) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def mean(self) -> float:
+        """Returns the mean of counted values."""
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, share: float) -> float:
+        """Estimates the value below which a share of values fall,
+        as the upper bound of its bucket.
+
+        Args:
+            share (float): share of values, between 0 and 1.
+
+        Returns:
+            float: estimated value, at most the largest value.
+        """
+        if not self.count:
+            return 0.0
+        rank = share * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class RequestMetrics:
+    """Collects phase timings, statuses, sizes and retries of
+    requests, grouped by url kind. Phases are DNS lookup, opening
+    a connection, time to first byte, downloading the body and
+    parsing it; total is the time from sending the request until
+    the body was read.
+    """
+
+    def __init__(self, kinds: Optional[List[Tuple[str, str]]] = None) -> None:
+        """
+        Args:
+            kinds (Optional[List[Tuple[str, str]]], optional): url regex
+                patterns with names of their kinds. The first matching
+                pattern is used, other urls are "other". Defaults to None.
+        """
+        self.kinds = [(re.compile(pattern), kind) for pattern, kind in kinds or []]
+        self.histograms: DefaultDict[str, Dict[str, Histogram]] = defaultdict(
+            lambda: {phase: Histogram() for phase in PHASES}
+        )
+        self.statuses: DefaultDict[str, Counter] = defaultdict(Counter)
+        self.bytes: Counter = Counter()
+        self.retries: Counter = Counter()
+        self.started = time.perf_counter()
+
+    def get_kind(self, url: str) -> str:
+        """Finds the kind of a url.
+
+        Args:
+            url (str): url address.
+
+        Returns:
+            str: kind of the url.
+        """
+        for pattern, kind in self.kinds:
+            if pattern.search(url):
+                return kind
+        return "other"
+
+    def observe(self, url: str, phase: str, seconds: float) -> None:
+        """Records the duration of a phase of a request.
+
+        Args:
+            url (str): url address.
+            phase (str): one of PHASES.
+            seconds (float): duration.
+        """
+        self.histograms[self.get_kind(url)][phase].add(seconds)
+
+    def trace_config(self) -> TraceConfig:
+        """Creates tracing of a session's requests into these metrics.
+
+        Returns:
+            TraceConfig: tracing to pass to the session.
+        """
+        trace = TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_dns_resolvehost_start.append(self._on_dns_start)
+        trace.on_dns_resolvehost_end.append(self._on_dns_end)
+        trace.on_connection_create_start.append(self._on_connection_start)
+        trace.on_connection_create_end.append(self._on_connection_end)
+        trace.on_request_end.append(self._on_request_end)
+        trace.on_response_chunk_received.append(self._on_body_received)
+        trace.on_request_exception.append(self._on_request_exception)
+        return trace
+
+    def summary(self) -> str:
+        """Describes requests of every kind, with percentiles
+        of their phases in milliseconds.
+
+        Returns:
+            str: summary.
+        """
+        elapsed = time.perf_counter() - self.started
+        requests = sum(sum(statuses.values()) for statuses in self.statuses.values())
+        lines = [
+            "{} requests in {:.1f}s, {:.1f} requests/s".format(
+                requests, elapsed, requests / elapsed if elapsed else 0.0
+            )
+        ]
+        for kind, histograms in sorted(self.histograms.items()):
+            statuses = self.statuses[kind]
+            lines.append(
+                "{}: {} requests, {} retries, {:.1f} MB, statuses {}".format(
+                    kind,
+                    sum(statuses.values()),
+                    self.retries[kind],
+                    self.bytes[kind] / 1e6,
+                    ", ".join(
+                        "{}: {}".format(status, count)
+                        for status, count in sorted(statuses.items(), key=str)
+                    ),
+                )
+            )
+            for phase in PHASES:
+                histogram = histograms[phase]
+                if histogram.count:
+                    lines.append(
+                        "  {:<9} mean {:>8.1f}  p50 {:>8.1f}  p99 {:>8.1f}  max {:>8.1f}".format(
+                            phase,
+                            histogram.mean() * 1000,
+                            histogram.percentile(0.5) * 1000,
+                            histogram.percentile(0.99) * 1000,
+                            histogram.max * 1000,
+                        )
+                    )
+        return "\n".join(lines)
+
+    # aiohttp calls the callbacks with the session, a namespace
+    # kept for the whole request, and the event's parameters
+
+    async def _on_request_start(
+        self, session: ClientSession, context: SimpleNamespace, params: Any
+    ) -> None:
+        context.url = str(params.url)
+        context.start = time.perf_counter()
+        context.dns = 0.0
+        context.headers = None
+        attempt = (context.trace_request_ctx or {}).get("attempt", 0)
+        if attempt:
+            self.retries[self.get_kind(context.url)] += 1
+
+    async def _on_dns_start(
+        self, session: ClientSession, context: SimpleNamespace, params: Any
+    ) -> None:
+        context.dns_start = time.perf_counter()
+
+    async def _on_dns_end(
+        self, session: ClientSession, context: SimpleNamespace, params: Any
+    ) -> None:
+        context.dns = time.perf_counter() - context.dns_start
+        self.observe(context.url, "dns", context.dns)
+
+    async def _on_connection_start(
+        self, session: ClientSession, context: SimpleNamespace, params: Any
+    ) -> None:
+        context.connection_start = time.perf_counter()
+
+    async def _on_connection_end(
+        self, session: ClientSession, context: SimpleNamespace, params: Any
+    ) -> None:
+        # Opening a connection includes resolving its host
+        connect = time.perf_counter() - context.connection_start - context.dns
+        self.observe(context.url, "connect", connect)
+
+    async def _on_request_end(
+        self, session: ClientSession, context: SimpleNamespace, params: Any
+    ) -> None:
+        context.headers = time.perf_counter()
+        kind = self.get_kind(context.url)
+        self.statuses[kind][params.response.status] += 1
+        self.observe(context.url, "ttfb", context.headers - context.start)
+        if params.response.status != 200:
+            self.observe(context.url, "total", context.headers - context.start)
+
+    async def _on_body_received(
+        self, session: ClientSession, context: SimpleNamespace, params: Any
+    ) -> None:
+        # Sent once the whole body was read
+        now = time.perf_counter()
+        self.bytes[self.get_kind(context.url)] += len(params.chunk)
+        if context.headers is not None:
+            self.observe(context.url, "download", now - context.headers)
+        self.observe(context.url, "total", now - context.start)
+
+    async def _on_request_exception(
+        self, session: ClientSession, context: SimpleNamespace, params: Any
+    ) -> None:
+        self.statuses[self.get_kind(context.url)][type(params.exception).__name__] += 1
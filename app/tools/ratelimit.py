@@ -0,0 +1,303 @@
+"""Controls how fast pages are requested from every host.
+Requests are paced by a token bucket, whose rate adapts to
+throttling, and the number of requests in flight adapts to
+latency and errors. Both grow additively and shrink
+multiplicatively. Failed requests are retried with jittered
+exponential backoff.
+"""
+import asyncio
+import datetime as dt
+import email.utils
+import random
+import time
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses Retry-After header, given in seconds or as a date.
+
+    Args:
+        value (Optional[str]): header value.
+
+    Returns:
+        Optional[float]: seconds to wait, if given.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=dt.timezone.utc)
+    return max((date - dt.datetime.now(dt.timezone.utc)).total_seconds(), 0.0)
+
+
+class TokenBucket:
+    """Allows requests at a steady rate, with short bursts.
+    The rate is halved when the host throttles requests and
+    grows by a tenth of the max rate every second otherwise."""
+
+    def __init__(
+        self, rate: float, burst: int, max_rate: Optional[float] = None
+    ) -> None:
+        """
+        Args:
+            rate (float): initial requests per second.
+            burst (int): max number of requests at once.
+            max_rate (Optional[float], optional): highest requests per second.
+                Defaults to None, the initial rate.
+        """
+        self.rate = rate
+        self.min_rate = min(rate, 1.0)
+        self.max_rate = max_rate or rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.decreased = 0.0
+
+    def increase(self) -> None:
+        """Raises the rate after a successful request."""
+        self.rate = min(self.rate + self.max_rate / 10 / self.rate, self.max_rate)
+
+    def decrease(self, latency: float) -> None:
+        """Halves the rate after a throttled request, at most
+        once per round trip.
+
+        Args:
+            latency (float): response time in seconds.
+        """
+        now = time.monotonic()
+        if now - self.decreased > latency:
+            self.rate = max(self.rate / 2, self.min_rate)
+            self.tokens = min(self.tokens, 0.0)
+            self.decreased = now
+
+    async def take(self) -> None:
+        """Waits until a token is available and takes it."""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """Limits the number of requests in flight. The limit grows
+    by one per round trip while responses are fast and successful,
+    and is halved on errors, throttling or slow responses."""
+
+    def __init__(
+        self,
+        limit: int = 4,
+        minimum: int = 1,
+        maximum: int = 64,
+        latency_target: float = 2.0,
+    ) -> None:
+        """
+        Args:
+            limit (int, optional): initial limit. Defaults to 4.
+            minimum (int, optional): lowest limit. Defaults to 1.
+            maximum (int, optional): highest limit. Defaults to 64.
+            latency_target (float, optional): seconds above which responses
+                count as slow. Defaults to 2.0.
+        """
+        self.limit = float(limit)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.active = 0
+        self.decreased = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        """Condition created on first use, within the running loop."""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self) -> None:
+        """Waits until another request can be sent."""
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+
+    async def cancel(self) -> None:
+        """Frees the slot of a request that wasn't sent,
+        without adjusting the limit."""
+        async with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    async def release(self, success: bool, latency: float) -> None:
+        """Adjusts the limit after a request finished.
+
+        Args:
+            success (bool): whether the response was successful.
+            latency (float): response time in seconds.
+        """
+        async with self.condition:
+            self.active -= 1
+            now = time.monotonic()
+            if success and latency <= self.latency_target:
+                self.limit = min(self.limit + 1 / self.limit, self.maximum)
+            elif now - self.decreased > latency:
+                # Requests in flight failed for the same reason,
+                # so decrease at most once per round trip
+                self.limit = max(self.limit / 2, self.minimum)
+                self.decreased = now
+            self.condition.notify_all()
+
+
+class RateLimiter:
+    """Keeps a token bucket and an adaptive concurrency limit
+    for every host."""
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        burst: int = 10,
+        max_rate: Optional[float] = None,
+        concurrency: int = 4,
+        max_concurrency: int = 64,
+        latency_target: float = 2.0,
+    ) -> None:
+        """
+        Args:
+            rate (float, optional): initial requests per second to a host.
+                Defaults to 10.0.
+            burst (int, optional): max number of requests to a host at once.
+                Defaults to 10.
+            max_rate (Optional[float], optional): highest requests per second
+                to a host. Defaults to None, the initial rate.
+            concurrency (int, optional): initial number of requests in flight
+                to a host. Defaults to 4.
+            max_concurrency (int, optional): max number of requests in flight
+                to a host. Defaults to 64.
+            latency_target (float, optional): seconds above which responses
+                count as slow. Defaults to 2.0.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.max_rate = max_rate
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def get_host(self, url: str) -> str:
+        """Creates limits of the url's host on first use.
+
+        Args:
+            url (str): url address.
+
+        Returns:
+            str: host of the url.
+        """
+        host = urlparse(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst, self.max_rate)
+            self.limiters[host] = AdaptiveLimiter(
+                self.concurrency, 1, self.max_concurrency, self.latency_target
+            )
+        return host
+
+    async def acquire(self, url: str) -> None:
+        """Waits until a request to the url can be sent. If waiting
+        is interrupted, the request's slot is freed again.
+
+        Args:
+            url (str): url address.
+        """
+        host = self.get_host(url)
+        await self.limiters[host].acquire()
+        try:
+            await self.buckets[host].take()
+        except BaseException:
+            await self.limiters[host].cancel()
+            raise
+
+    async def release(self, url: str, status: Optional[int], latency: float) -> None:
+        """Reports the outcome of a request to the url.
+
+        Args:
+            url (str): url address.
+            status (Optional[int]): response status, None if the request failed.
+            latency (float): response time in seconds.
+        """
+        host = self.get_host(url)
+        success = status is not None and status not in RETRY_STATUSES
+        if status == 429:
+            self.buckets[host].decrease(latency)
+        elif success:
+            self.buckets[host].increase()
+        await self.limiters[host].release(success, latency)
+
+
+class RetryPolicy:
+    """Decides which failed requests are retried and how long to wait."""
+
+    def __init__(
+        self,
+        retries: int = 3,
+        base: float = 0.5,
+        cap: float = 60.0,
+        statuses: Iterable[int] = RETRY_STATUSES,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            retries (int, optional): max number of retries. Defaults to 3.
+            base (float, optional): seconds before the first retry. Defaults to 0.5.
+            cap (float, optional): max seconds between retries. Defaults to 60.0.
+            statuses (Iterable[int], optional): response statuses to retry.
+                Defaults to RETRY_STATUSES.
+            seed (Optional[int], optional): seed of the jitter. Defaults to None.
+        """
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+        self.statuses = set(statuses)
+        self.random = random.Random(seed)
+
+    def should_retry(self, attempt: int, status: Optional[int]) -> bool:
+        """Checks if a request should be retried.
+
+        Args:
+            attempt (int): number of retries so far.
+            status (Optional[int]): response status, None if the request failed.
+
+        Returns:
+            bool: True if the request should be retried.
+        """
+        return attempt < self.retries and (status is None or status in self.statuses)
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Calculates seconds to wait before a retry. Random jitter
+        spreads retries of many requests failed at once.
+
+        Args:
+            attempt (int): number of retries so far.
+            retry_after (Optional[float], optional): seconds the host asked
+                to wait. Defaults to None.
+
+        Returns:
+            float: seconds to wait.
+        """
+        backoff = min(self.cap, self.base * 2 ** attempt)
+        delay = self.random.uniform(backoff / 2, backoff)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
@@ -1,6 +1,6 @@
 """Data Repository for data persistance."""
 import abc
-from typing import Dict, Optional
+from typing import Any, Dict, Optional, Sequence, Set
 import os
 
 import pandas as pd
@@ -24,6 +24,40 @@ class AbstractRepository(abc.ABC):
     def _get(self, identifier: str) -> Optional[Dict]:
         raise NotImplementedError
 
+    def values(self, column: str) -> Set:
+        """This method returns all distinct values of a column,
+        for example urls of already scraped pages.
+
+        Args:
+            column: column name.
+
+        Returns:
+            set of values, empty if there's no such column.
+        """
+        return self._values(column)
+
+    @abc.abstractmethod
+    def _values(self, column: str) -> Set:
+        raise NotImplementedError
+
+    def mapping(self, key: str, column: str) -> Dict[Any, Any]:
+        """This method maps values of a key column to values
+        of another column, for example fighters to the time
+        they were fetched.
+
+        Args:
+            key: column name of the keys.
+            column: column name of the values.
+
+        Returns:
+            dictionary of values, None where a value is missing.
+        """
+        return self._mapping(key, column)
+
+    @abc.abstractmethod
+    def _mapping(self, key: str, column: str) -> Dict[Any, Any]:
+        raise NotImplementedError
+
     def add(self, data: Dict) -> None:
         """Inserts object into the repository. This will not persist
         the object, only store it temporarly in memory.
@@ -38,6 +72,21 @@ class AbstractRepository(abc.ABC):
     def _add(self, data: Dict) -> None:
         raise NotImplementedError
 
+    def replace(self, data: Dict, key: Optional[Sequence[str]] = None) -> None:
+        """Inserts object into the repository, in place of objects
+        with the same key if there are any. Like add, it's persisted
+        only on commit.
+
+        Args:
+            data: data to be stored.
+            key: columns identifying the object, by default its ID.
+        """
+        self._replace(data, key)
+
+    @abc.abstractmethod
+    def _replace(self, data: Dict, key: Optional[Sequence[str]] = None) -> None:
+        raise NotImplementedError
+
     def commit(self) -> None:
         """Persists data from memory to drive.
         Similar in effect to SQL commit, or
@@ -88,6 +137,22 @@ class CSVRepository(AbstractRepository):
             raise DataIntegrityError(msg)
         return None
 
+    def _values(self, column: str) -> Set:
+        if column not in self.data:
+            return set()
+        return set(self.data[column].dropna())
+
+    def _mapping(self, key: str, column: str) -> Dict[Any, Any]:
+        if key not in self.data:
+            return {}
+        if column not in self.data:
+            return dict.fromkeys(self.data[key].dropna())
+        subset = self.data.dropna(subset=[key])
+        return {
+            item: None if pd.isna(value) else value
+            for item, value in zip(subset[key], subset[column])
+        }
+
     def _add(self, data: Dict) -> None:
         current_id = data[self.id_column]
         if self.get(current_id):
@@ -95,5 +160,14 @@ class CSVRepository(AbstractRepository):
             raise DataIntegrityError(msg)
         self.data = self.data.append(data, ignore_index=True)
 
+    def _replace(self, data: Dict, key: Optional[Sequence[str]] = None) -> None:
+        columns = key or [self.id_column]
+        if all(column in self.data for column in columns):
+            same = pd.Series(True, index=self.data.index)
+            for column in columns:
+                same &= self.data[column] == data[column]
+            self.data = self.data.loc[~same]
+        self.data = self.data.append(data, ignore_index=True)
+
     def _commit(self):
         self.data.to_csv(self.path)
@@ -3,28 +3,85 @@ Handles the asynchronous http calls.
 """
 import asyncio
 import logging
-from typing import Any, List, Iterable, Optional, Callable, Tuple
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
-from aiohttp import ClientSession, TCPConnector
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
 import requests
 
+from app.tools.archive import HtmlArchive
+from app.tools.cache import ResponseCache
+from app.tools.frontier import CrawlFrontier
+from app.tools.metrics import RequestMetrics
+from app.tools.ratelimit import RateLimiter, RetryPolicy, parse_retry_after
+
 logging.getLogger().setLevel(logging.INFO)
 
 
-def get_content(uri: str) -> Optional[str]:
+class FetchError(Exception):
+    """Indicates a page that couldn't be fetched."""
+
+
+def get_content(
+    uri: str,
+    cache: Optional[ResponseCache] = None,
+    policy: Optional[RetryPolicy] = None,
+) -> Optional[str]:
     """Extracts content from web page.
 
     Args:
         uri (str): web page adress.
+        cache (Optional[ResponseCache], optional): cache of responses.
+            Defaults to None.
+        policy (Optional[RetryPolicy], optional): retries of failed requests.
+            Defaults to None, so they're not retried.
 
     Returns:
         str: web page content.
     """
-    with requests.get(uri) as response:
-        if response.status_code == 200:
-            content = response.content
-            return content.decode(encoding="utf8")
-    return None
+    cached = cache.get(uri) if cache else None
+    if cached and cache.is_fresh(cached):
+        return cached.body.decode(encoding="utf8")
+    headers = ResponseCache.validators(cached) if cached else {}
+    attempt = 0
+    while True:
+        status, retry_after = None, None
+        try:
+            with requests.get(uri, headers=headers) as response:
+                status = response.status_code
+                if status == 304 and cached:
+                    cache.refresh(cached, response.headers)
+                    return cached.body.decode(encoding="utf8")
+                if status == 200:
+                    content = response.content
+                    if cache:
+                        cache.store(uri, content, response.headers)
+                    return content.decode(encoding="utf8")
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        except requests.RequestException:
+            logging.exception("Request to %s failed", uri)
+        if policy is None or not policy.should_retry(attempt, status):
+            logging.warning("Giving up on %s after status %s", uri, status)
+            return None
+        delay = policy.delay(attempt, retry_after)
+        logging.warning("Retrying %s in %.2fs after status %s", uri, delay, status)
+        attempt += 1
+        time.sleep(delay)
 
 
 def run(links: List[str], func: Callable, batch_size: int = 50) -> List[Any]:
@@ -42,13 +99,8 @@ def run(links: List[str], func: Callable, batch_size: int = 50) -> List[Any]:
     Returns:
         List[Any]: list of the resutls.
     """
-    result = []
-    for current, _ in batch(links, batch_size):
-        loop = asyncio.get_event_loop()
-        future = asyncio.ensure_future(scrape(current, func))
-        partial = loop.run_until_complete(future)
-        result.extend(partial)
-    return result
+    with Scraper() as engine:
+        return engine.run(links, func, batch_size)
 
 
 async def scrape(links: List[str], func: Callable) -> List[Any]:
@@ -73,19 +125,541 @@ async def scrape(links: List[str], func: Callable) -> List[Any]:
 
         responses = await asyncio.gather(*tasks)
         # All content is now extracted
+        return parse(responses, func)
+
+
+def parse(responses: Iterable[Tuple[bytes, str]], func: Callable) -> List[Any]:
+    """Parses fetched contents using func.
+
+    Args:
+        responses (Iterable[Tuple[bytes, str]]): contents and their urls.
+        func (Callable): function that parses url content.
+
+    Returns:
+        List[Any]: list of parsing results.
+    """
+    data = []
+    for content, link in responses:
+        try:
+            result = func(content, link)
+        except Exception as err:
+            logging.exception("Exception while parsing %s", link)
+            raise err
+        if not isinstance(result, list):
+            data.append(result)
+        else:
+            data.extend(result)
+    return data
+
+
+def parse_page(response: Tuple[bytes, str], func: Callable) -> Tuple[str, List[Any]]:
+    """Parses content of a single page using func.
+
+    Args:
+        response (Tuple[bytes, str]): content and its url.
+        func (Callable): function that parses url content.
+
+    Returns:
+        Tuple[str, List[Any]]: url and its parsing results.
+    """
+    return response[1], parse([response], func)
+
+
+def parse_page_timed(
+    response: Tuple[bytes, str], func: Callable
+) -> Tuple[Tuple[str, List[Any]], float]:
+    """Parses content of a single page using func and measures
+    how long it took.
+
+    Args:
+        response (Tuple[bytes, str]): content and its url.
+        func (Callable): function that parses url content.
+
+    Returns:
+        Tuple[Tuple[str, List[Any]], float]: url with its parsing results,
+            and seconds of parsing.
+    """
+    start = time.perf_counter()
+    page = parse_page(response, func)
+    return page, time.perf_counter() - start
+
+
+class Scraper:
+    """Scrapes web pages within one event loop and one client session,
+    kept for the whole crawl. Connections stay alive between batches,
+    so handshakes and DNS lookups are not repeated for every batch.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        dns_cache_ttl: Optional[int] = 300,
+        keepalive_timeout: float = 30.0,
+        cache: Optional[ResponseCache] = None,
+        parse_workers: int = 0,
+        limiter: Optional[RateLimiter] = None,
+        policy: Optional[RetryPolicy] = None,
+        timeout: Optional[float] = 60.0,
+        frontier: Optional[CrawlFrontier] = None,
+        archive: Optional[HtmlArchive] = None,
+        metrics: Optional[RequestMetrics] = None,
+    ) -> None:
+        """
+        Args:
+            limit (int, optional): max number of open connections.
+                Defaults to 100.
+            limit_per_host (int, optional): max number of open connections
+                to a single host, 0 for no limit. Defaults to 0.
+            dns_cache_ttl (Optional[int], optional): seconds to cache resolved
+                hosts, None to cache them forever. Defaults to 300.
+            keepalive_timeout (float, optional): seconds to keep idle
+                connections open. Defaults to 30.0.
+            cache (Optional[ResponseCache], optional): cache of responses.
+                Defaults to None.
+            parse_workers (int, optional): number of processes parsing pages
+                while the next ones are fetched, 0 to parse them in the event
+                loop. Defaults to 0.
+            limiter (Optional[RateLimiter], optional): limits of requests
+                to every host. Defaults to None.
+            policy (Optional[RetryPolicy], optional): retries of failed
+                requests. Defaults to None, so they're not retried.
+            timeout (Optional[float], optional): max seconds of a single
+                request. Defaults to 60.0.
+            frontier (Optional[CrawlFrontier], optional): state of the crawl,
+                where urls are marked as in flight or failed. Defaults to None.
+            archive (Optional[HtmlArchive], optional): archive where fetched
+                pages are stored. Defaults to None.
+            metrics (Optional[RequestMetrics], optional): metrics where timings
+                of requests and parsing are recorded, summarized when the
+                scraper is closed. Defaults to None.
+        """
+        self.connector_options = {
+            "limit": limit,
+            "limit_per_host": limit_per_host,
+            "ttl_dns_cache": dns_cache_ttl,
+            "keepalive_timeout": keepalive_timeout,
+        }
+        self.cache = cache
+        self.parse_workers = parse_workers
+        self.limiter = limiter
+        self.policy = policy
+        self.timeout = timeout
+        self.frontier = frontier
+        self.archive = archive
+        self.metrics = metrics
+        self.failed: Dict[str, str] = {}
+        self.loop = asyncio.new_event_loop()
+        self.session: Optional[ClientSession] = None
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "Scraper":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    async def get_session(self) -> ClientSession:
+        """Returns the session, creating it on first use,
+        so it's bound to the scraper's event loop.
+
+        Returns:
+            ClientSession: session.
+        """
+        if self.session is None:
+            connector = TCPConnector(ssl=False, **self.connector_options)
+            traces = [self.metrics.trace_config()] if self.metrics else None
+            self.session = ClientSession(
+                connector=connector,
+                timeout=ClientTimeout(total=self.timeout),
+                trace_configs=traces,
+            )
+        return self.session
+
+    def run(self, links: List[str], func: Callable, batch_size: int = 50) -> List[Any]:
+        """Scrapes links keeping up to batch_size requests in flight,
+        and parses them using func. A new request starts as soon as
+        any other finishes, so a slow page doesn't hold up the rest.
+        Results are in the order their pages were fetched.
+
+        Args:
+            links (List[str]): list of urls to be scraped.
+            func (Callable): parser function.
+            batch_size (int, optional): how many urls should be loaded
+                at once. Defaults to 50.
+
+        Returns:
+            List[Any]: list of the results.
+        """
+        return self.loop.run_until_complete(self.scrape_window(links, func, batch_size))
+
+    def records(
+        self,
+        links: Union[Iterable[str], AsyncIterable[str]],
+        func: Callable,
+        batch_size: int = 50,
+    ) -> Iterator[Any]:
+        """Scrapes links like run, but yields every parsed record as
+        soon as its page is parsed, so records can be saved on the go.
+
+        Args:
+            links (Union[Iterable[str], AsyncIterable[str]]): urls to be scraped.
+            func (Callable): parser function.
+            batch_size (int, optional): how many urls should be loaded
+                at once. Defaults to 50.
+
+        Yields:
+            Any: parsed records.
+        """
+        return self.iterate(self.stream(links, func, batch_size))
+
+    def pages(
+        self,
+        links: Union[Iterable[str], AsyncIterable[str]],
+        func: Callable,
+        batch_size: int = 50,
+    ) -> Iterator[Tuple[str, List[Any]]]:
+        """Scrapes links like records, but yields all records
+        of a page at once, along with the page's url.
+
+        Args:
+            links (Union[Iterable[str], AsyncIterable[str]]): urls to be scraped.
+            func (Callable): parser function.
+            batch_size (int, optional): how many urls should be loaded
+                at once. Defaults to 50.
+
+        Yields:
+            Tuple[str, List[Any]]: url and its parsing results.
+        """
+        return self.iterate(self.iter_results(links, func, batch_size))
+
+    def iterate(self, iterator: AsyncGenerator[Any, None]) -> Iterator[Any]:
+        """Runs an async generator in the scraper's event loop
+        one item at a time.
+
+        Args:
+            iterator (AsyncGenerator[Any, None]): async generator.
+
+        Yields:
+            Any: items of the iterator.
+        """
+        try:
+            while True:
+                try:
+                    yield self.loop.run_until_complete(iterator.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            if not self.loop.is_closed():
+                self.loop.run_until_complete(iterator.aclose())
+
+    async def stream(
+        self,
+        links: Union[Iterable[str], AsyncIterable[str]],
+        func: Callable,
+        concurrency: int = 50,
+    ) -> AsyncIterator[Any]:
+        """Fetches urls and yields every parsed record as soon as
+        its page is parsed.
+
+        Args:
+            links (Union[Iterable[str], AsyncIterable[str]]): urls to scrape.
+            func (Callable): function that parses url content.
+            concurrency (int, optional): max number of requests in flight.
+                Defaults to 50.
+
+        Yields:
+            Any: parsed records.
+        """
+        async for _, results in self.iter_results(links, func, concurrency):
+            for result in results:
+                yield result
+
+    def run_batches(self, links: List[str], func: Callable, batch_size: int = 50) -> List[Any]:
+        """Scrapes links in batches, waiting for the whole batch
+        before starting the next one, and parses them using func.
+
+        Args:
+            links (List[str]): list of urls to be scraped.
+            func (Callable): parser function.
+            batch_size (int, optional): how many urls should be loaded
+                at once. Defaults to 50.
+
+        Returns:
+            List[Any]: list of the results.
+        """
+        result = []
+        for current, _ in batch(links, batch_size):
+            result.extend(self.loop.run_until_complete(self.scrape(current, func)))
+        return result
+
+    async def scrape(self, links: List[str], func: Callable) -> List[Any]:
+        """Extracts content of urls within the shared session
+        and parses them using func.
+
+        Args:
+            links (List[str]): list of urls to scrape.
+            func (Callable): function that parses url content.
+
+        Returns:
+            List[Any]: list of parsing results.
+        """
+        session = await self.get_session()
+        responses = await asyncio.gather(
+            *[self.fetch(link, session) for link in links]
+        )
+        return parse(responses, func)
+
+    async def scrape_window(
+        self,
+        links: Union[Iterable[str], AsyncIterable[str]],
+        func: Callable,
+        concurrency: int,
+    ) -> List[Any]:
+        """Extracts content of urls with a bounded number of requests
+        in flight and parses every page as soon as it's fetched.
+
+        Args:
+            links (Union[Iterable[str], AsyncIterable[str]]): urls to scrape.
+            func (Callable): function that parses url content.
+            concurrency (int): max number of requests in flight.
+
+        Returns:
+            List[Any]: list of parsing results.
+        """
         data = []
-        for content, link in responses:
-            try:
-                result = func(content, link)
-            except Exception as err:
-                logging.exception("Exception while parsing %s", link)
-                raise err
-            if not isinstance(result, list):
-                data.append(result)
-            else:
-                data.extend(result)
+        async for _, results in self.iter_results(links, func, concurrency):
+            data.extend(results)
         return data
 
+    async def iter_results(
+        self,
+        links: Union[Iterable[str], AsyncIterable[str]],
+        func: Callable,
+        concurrency: int,
+    ) -> AsyncIterator[Tuple[str, List[Any]]]:
+        """Fetches urls and yields parsing results of every page.
+        With parse workers, pages are parsed in other processes while
+        the next ones are fetched. At most two pages per worker wait
+        for parsing, otherwise fetching is paused, so memory is bounded.
+
+        Args:
+            links (Union[Iterable[str], AsyncIterable[str]]): urls to scrape.
+            func (Callable): function that parses url content,
+                must be picklable with parse workers.
+            concurrency (int): max number of requests in flight.
+
+        Yields:
+            Tuple[str, List[Any]]: url and parsing results of a single page.
+        """
+        if not self.parse_workers:
+            async for response in self.iter_responses(links, concurrency):
+                yield self.record_parse(*parse_page_timed(response, func))
+            return
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.parse_workers)
+        pending: Set[asyncio.Future] = set()
+        async for response in self.iter_responses(links, concurrency):
+            pending.add(
+                self.loop.run_in_executor(self.pool, parse_page_timed, response, func)
+            )
+            if len(pending) >= 2 * self.parse_workers:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield self.record_parse(*task.result())
+        for task in asyncio.as_completed(pending):
+            yield self.record_parse(*(await task))
+
+    def record_parse(
+        self, page: Tuple[str, List[Any]], seconds: float
+    ) -> Tuple[str, List[Any]]:
+        """Records parsing time of a page in the metrics.
+
+        Args:
+            page (Tuple[str, List[Any]]): url and its parsing results.
+            seconds (float): seconds of parsing.
+
+        Returns:
+            Tuple[str, List[Any]]: the page.
+        """
+        if self.metrics:
+            self.metrics.observe(page[0], "parse", seconds)
+        return page
+
+    async def iter_responses(
+        self, links: Union[Iterable[str], AsyncIterable[str]], concurrency: int
+    ) -> AsyncIterator[Tuple[bytes, str]]:
+        """Fetches urls from a queue by a pool of workers,
+        yielding responses as soon as they complete. Urls can
+        be produced asynchronously, while others are fetched.
+
+        Args:
+            links (Union[Iterable[str], AsyncIterable[str]]): urls to fetch.
+            concurrency (int): number of workers, so max
+                number of requests in flight.
+
+        Yields:
+            Tuple[bytes, str]: contents of the url, and the url itself.
+                Urls that couldn't be fetched are logged in failed.
+        """
+        session = await self.get_session()
+        workers_count = max(concurrency, 1)
+        # Bounded queues pause the producer when workers are busy,
+        # and workers when responses are not consumed fast enough
+        queue: asyncio.Queue = asyncio.Queue(workers_count)
+        results: asyncio.Queue = asyncio.Queue(workers_count)
+
+        async def feed() -> None:
+            try:
+                if isinstance(links, AsyncIterable):
+                    async for link in links:
+                        await queue.put(link)
+                else:
+                    for link in links:
+                        await queue.put(link)
+            finally:
+                for _ in range(workers_count):
+                    await queue.put(None)
+
+        async def work() -> None:
+            while True:
+                link = await queue.get()
+                if link is None:
+                    break
+                try:
+                    await results.put(await self.fetch(link, session))
+                except Exception as err:  # pylint: disable=broad-except
+                    await results.put(err)
+            await results.put(None)
+
+        feeder = asyncio.ensure_future(feed())
+        workers = [asyncio.ensure_future(work()) for _ in range(workers_count)]
+        try:
+            finished = 0
+            while finished < workers_count:
+                response = await results.get()
+                if response is None:
+                    finished += 1
+                elif isinstance(response, FetchError):
+                    url, reason = response.args
+                    logging.warning("Failed to fetch %s: %s", url, reason)
+                    self.failed[url] = reason
+                    if self.frontier:
+                        self.frontier.fail(url, reason)
+                elif isinstance(response, Exception):
+                    raise response
+                else:
+                    yield response
+            # Raises the producer's exception, if any
+            await feeder
+        finally:
+            for task in [feeder] + workers:
+                task.cancel()
+            await asyncio.gather(feeder, *workers, return_exceptions=True)
+
+    async def discover(
+        self,
+        listings: Iterable[str],
+        func: Callable,
+        concurrency: int = 5,
+        known: Optional[Set[str]] = None,
+    ) -> AsyncIterator[str]:
+        """Fetches listing pages and yields links found in them
+        as soon as each page is parsed. Every link is yielded once,
+        even if it's listed on many pages.
+
+        Args:
+            listings (Iterable[str]): urls of listing pages.
+            func (Callable): function that extracts links from page content.
+            concurrency (int, optional): max number of listing pages
+                in flight. Defaults to 5.
+            known (Optional[Set[str]], optional): links that should be
+                skipped. Defaults to None.
+
+        Yields:
+            str: newly found links.
+        """
+        seen = set(known or ())
+        async for content, url in self.iter_responses(listings, concurrency):
+            for link in func(content, url):
+                if link not in seen:
+                    seen.add(link)
+                    yield link
+
+    async def discover_new(
+        self,
+        listings: Iterable[str],
+        func: Callable,
+        known: Set[str],
+        overlap: int = 0,
+    ) -> AsyncIterator[str]:
+        """Fetches listing pages one by one, ordered newest first, and
+        yields links that are not known yet. Stops once a page lists
+        only known links, after checking overlap more pages for
+        links posted late.
+
+        Args:
+            listings (Iterable[str]): urls of listing pages, newest first.
+            func (Callable): function that extracts links from page content.
+            known (Set[str]): links that were already scraped.
+            overlap (int, optional): number of pages checked after the first
+                page without new links. Defaults to 0.
+
+        Yields:
+            str: newly found links.
+        """
+        session = await self.get_session()
+        seen = set(known)
+        stale = 0
+        for listing in listings:
+            try:
+                content, url = await self.fetch(listing, session)
+            except FetchError as err:
+                logging.warning("Failed to fetch %s: %s", *err.args)
+                self.failed[listing] = err.args[1]
+                continue
+            new = [link for link in func(content, url) if link not in seen]
+            seen.update(new)
+            for link in new:
+                yield link
+            stale = 0 if new else stale + 1
+            if stale > overlap:
+                logging.info("No new links up to %s, stopping.", listing)
+                return
+
+    async def fetch(self, url: str, session: ClientSession) -> Tuple[bytes, str]:
+        """Fetches content of a single url with the scraper's cache,
+        limits and retries, and stores it in the archive.
+
+        Args:
+            url (str): full url address.
+            session (ClientSession): session.
+
+        Returns:
+            Tuple[bytes, str]: contents of the url, and the url itself.
+        """
+        if self.frontier:
+            self.frontier.start(url)
+        content, url = await fetch(url, session, self.cache, self.limiter, self.policy)
+        if self.archive is not None:
+            self.archive.append(url, content)
+        return content, url
+
+    def close(self) -> None:
+        """Closes the session with all its connections, the parse
+        workers and the event loop, and logs a summary of metrics."""
+        if self.session is not None:
+            self.loop.run_until_complete(self.session.close())
+            self.session = None
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        self.loop.close()
+        if self.metrics:
+            logging.info("Request metrics:\n%s", self.metrics.summary())
+
 
 def batch(iterable: List[Any], size: int = 1) -> Iterable[Tuple[Any, int]]:
     """Allows to generate a batch of n subsets
@@ -103,15 +677,68 @@ def batch(iterable: List[Any], size: int = 1) -> Iterable[Tuple[Any, int]]:
         yield iterable[ndx : min(ndx + size, length)], ndx
 
 
-async def fetch(url: str, session: ClientSession) -> Tuple[bytes, str]:
-    """Fetches content of a single url.
+async def fetch(
+    url: str,
+    session: ClientSession,
+    cache: Optional[ResponseCache] = None,
+    limiter: Optional[RateLimiter] = None,
+    policy: Optional[RetryPolicy] = None,
+) -> Tuple[bytes, str]:
+    """Fetches content of a single url. With a cache, fresh
+    responses are read from disk and stale ones are revalidated.
+    Failed requests are retried, waiting at least as long as
+    the host asked in Retry-After.
 
     Args:
         url (str): full url address.
         session (ClientSession): session.
+        cache (Optional[ResponseCache], optional): cache of responses.
+            Defaults to None.
+        limiter (Optional[RateLimiter], optional): limits of requests
+            to every host. Defaults to None.
+        policy (Optional[RetryPolicy], optional): retries of failed requests.
+            Defaults to None, so they're not retried.
+
+    Raises:
+        FetchError: if the url couldn't be fetched.
 
     Returns:
         Tuple[str, str]: contents of the url, and the url itself
     """
-    async with session.get(url) as response:
-        return await response.read(), url
+    cached = cache.get(url) if cache else None
+    if cached and cache.is_fresh(cached):
+        return cached.body, url
+    headers = ResponseCache.validators(cached) if cached else {}
+    attempt = 0
+    while True:
+        status, retry_after, reason = None, None, ""
+        if limiter:
+            await limiter.acquire(url)
+        start = time.perf_counter()
+        try:
+            # Tells tracing which requests are retries
+            context = {"attempt": attempt}
+            request = session.get(url, headers=headers, trace_request_ctx=context)
+            async with request as response:
+                status = response.status
+                if status == 304 and cached:
+                    cache.refresh(cached, response.headers)
+                    return cached.body, url
+                if status == 200:
+                    content = await response.read()
+                    if cache:
+                        cache.store(url, content, response.headers)
+                    return content, url
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                reason = "status {}".format(status)
+        except (ClientError, asyncio.TimeoutError) as err:
+            reason = repr(err)
+        finally:
+            if limiter:
+                await limiter.release(url, status, time.perf_counter() - start)
+        if policy is None or not policy.should_retry(attempt, status):
+            raise FetchError(url, reason)
+        delay = policy.delay(attempt, retry_after)
+        logging.info("Retrying %s in %.2fs after %s", url, delay, reason)
+        attempt += 1
+        await asyncio.sleep(delay)
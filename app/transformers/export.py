@@ -0,0 +1,132 @@
+"""Exports transformed stats as a flat float32 feature matrix,
+saved in .npy files that can be memory mapped for training.
+"""
+import json
+import os
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from app.transformers.sherdog import METHODS, RESULTS
+
+STATS_COLUMNS = (
+    [
+        "history.{}.{}".format(result, method)
+        for result in RESULTS
+        for method in METHODS
+    ]
+    + ["history.since_last_fight", "history.fights", "history.time", "history.positions"]
+    + ["streak.win", "streak.loss"]
+    + [
+        "cumulative.{}.{}.{}".format(placement, result, method)
+        for placement in RESULTS
+        for result in RESULTS
+        for method in METHODS
+    ]
+)
+FEATURE_COLUMNS = [
+    "{}.{}".format(side, column)
+    for side in ["fighter", "opponent"]
+    for column in STATS_COLUMNS
+]
+
+
+def get_value(stats: Dict[str, Any], column: str) -> Any:
+    """Reads a value from nested stats dicts.
+
+    Args:
+        stats (Dict[str, Any]): nested stats.
+        column (str): path to the value, like history.win.total.
+
+    Returns:
+        Any: the value.
+    """
+    for key in column.split("."):
+        stats = stats[key]
+    return stats
+
+
+def flatten_records(
+    records: List[Dict[str, Any]]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Turns transformed stats into a feature matrix, labels and dates.
+
+    Args:
+        records (List[Dict[str, Any]]): stats with fighter's and
+            opponent's cumulative stats.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: float32 features,
+            labels (1 for win and 0 for loss) and fights' dates.
+    """
+    features = np.empty((len(records), len(FEATURE_COLUMNS)), dtype=np.float32)
+    for i, record in enumerate(records):
+        features[i] = [get_value(record, column) for column in FEATURE_COLUMNS]
+    labels = np.array(
+        [str(record["result"]).lower() == "win" for record in records], dtype=np.int8
+    )
+    dates = np.array([record["date"] for record in records], dtype="datetime64[D]")
+    return features, labels, dates
+
+
+def export_features(partitions: Iterable[List[Dict[str, Any]]], directory: str) -> int:
+    """Saves transformed stats as features.npy, labels.npy, dates.npy
+    and columns.json in a directory. Partitions are flattened one
+    at a time, so only compact float32 blocks are kept in memory.
+
+    Args:
+        partitions (Iterable[List[Dict[str, Any]]]): partitions of stats.
+        directory (str): output directory.
+
+    Returns:
+        int: number of exported rows.
+    """
+    os.makedirs(directory, exist_ok=True)
+    blocks = [flatten_records(partition) for partition in partitions]
+    rows = sum(len(labels) for _, labels, _ in blocks)
+    outputs = {
+        "features": ((rows, len(FEATURE_COLUMNS)), np.float32),
+        "labels": ((rows,), np.int8),
+        "dates": ((rows,), np.dtype("datetime64[D]")),
+    }
+    arrays = {
+        name: np.lib.format.open_memmap(
+            os.path.join(directory, name + ".npy"), mode="w+", dtype=dtype, shape=shape
+        )
+        for name, (shape, dtype) in outputs.items()
+    }
+    start = 0
+    blocks.reverse()
+    while blocks:
+        block = blocks.pop()
+        end = start + len(block[1])
+        for name, values in zip(outputs, block):
+            arrays[name][start:end] = values
+        start = end
+    for values in arrays.values():
+        values.flush()
+    with open(os.path.join(directory, "columns.json"), "w") as output_file:
+        json.dump(FEATURE_COLUMNS, output_file)
+    return rows
+
+
+def load_features(
+    directory: str, mmap: bool = True
+) -> Tuple[np.ndarray, List[str], np.ndarray, np.ndarray]:
+    """Loads exported features without parsing or copying them.
+
+    Args:
+        directory (str): directory with exported features.
+        mmap (bool, optional): whether to memory map the arrays. Defaults to True.
+
+    Returns:
+        Tuple[np.ndarray, List[str], np.ndarray, np.ndarray]: features,
+            column names, labels and dates.
+    """
+    mode = "r" if mmap else None
+    features = np.load(os.path.join(directory, "features.npy"), mmap_mode=mode)
+    labels = np.load(os.path.join(directory, "labels.npy"), mmap_mode=mode)
+    dates = np.load(os.path.join(directory, "dates.npy"), mmap_mode=mode)
+    with open(os.path.join(directory, "columns.json")) as input_file:
+        columns = json.load(input_file)
+    return features, columns, labels, dates
@@ -0,0 +1,281 @@
+"""Updates fights stats with newly added fights, starting
+from the last known state of every fighter instead of
+transforming the full history again.
+"""
+import datetime as dt
+import logging
+import os
+import pickle
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from app.transformers.sherdog import CumulativeStat, FighterStat, Sequencer
+from app.transformers.vectorized import VectorizedCumulator, VectorizedSequencer
+
+
+def transform_batch(data: pd.DataFrame, workers: int = 1) -> List[Dict]:
+    """Transforms fights into pre fight stats of both fighters,
+    with cumulative stats of their opponents.
+
+    Args:
+        data (pd.DataFrame): fights data.
+        workers (int, optional): number of processes computing stats
+            of fighters' shards. Defaults to 1.
+
+    Returns:
+        List[Dict]: stats from fighter's and opponent's perspective.
+    """
+    sequencer = VectorizedSequencer(workers=workers)
+    cumulator = VectorizedCumulator(workers=workers)
+    # Calculate pre-fight stats
+    sequences = sequencer.fit_transform(data)
+    # Exchange stats
+    exchanged = sequencer.exchange(sequences)
+    # Calculate cumulative stats
+    accumulated = cumulator.fit_transform(exchanged)
+    # Exchange stats
+    return cumulator.exchange(accumulated)
+
+
+class FighterState:
+    """Fighter's stats before his last known fight, along with
+    the opponent's history from that fight."""
+
+    __slots__ = ("stat", "cumulative", "opponent_history")
+
+    def __init__(
+        self,
+        stat: FighterStat,
+        cumulative: CumulativeStat,
+        opponent_history: Dict[str, Any],
+    ) -> None:
+        self.stat = stat
+        self.cumulative = cumulative
+        self.opponent_history = opponent_history
+
+    def advance(
+        self, fight: Dict[str, Any], date: dt.date
+    ) -> Tuple[FighterStat, CumulativeStat]:
+        """Creates stats for the next fight, adding the result
+        of the last known fight.
+
+        Args:
+            fight (Dict[str, Any]): next fight information.
+            date (dt.date): date of the next fight.
+
+        Returns:
+            Tuple[FighterStat, CumulativeStat]: stats before the next fight.
+        """
+        stat = self.stat.advance(fight, date)
+        placement = self.stat.fight["result"].lower()
+        cumulative = self.cumulative.add(placement, self.opponent_history)
+        return stat, cumulative
+
+
+class IncrementalTransformer:
+    """Transforms fights into the same stats as transform_batch,
+    one fight at a time, keeping the state of every fighter
+    after his last known fight."""
+
+    def __init__(self, states: Optional[Dict[Any, FighterState]] = None) -> None:
+        self.states: Dict[Any, FighterState] = states or {}
+
+    @classmethod
+    def load(cls, path: str) -> "IncrementalTransformer":
+        """Loads fighters' states saved in a file. If the file
+        doesn't exist yet, starts with no known fighters.
+
+        Args:
+            path (str): path to the file.
+
+        Returns:
+            IncrementalTransformer: transformer with loaded states.
+        """
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "rb") as input_file:
+            return cls(pickle.load(input_file))
+
+    def save(self, path: str) -> None:
+        """Saves fighters' states in a file.
+
+        Args:
+            path (str): path to the file.
+        """
+        with open(path, "wb") as output_file:
+            pickle.dump(self.states, output_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def update(
+        self, new: pd.DataFrame, history: Optional[pd.DataFrame] = None
+    ) -> List[Dict]:
+        """Transforms new fights on top of the known states.
+        Fighters whose new fights are older than their last known
+        fight are recomputed from history, along with their later
+        opponents, and all their stats since the earliest new fight
+        are returned again.
+
+        Args:
+            new (pd.DataFrame): newly added fights.
+            history (pd.DataFrame, optional): all fights, including new ones.
+                Needed only when fights arrive out of order.
+
+        Returns:
+            List[Dict]: stats from fighter's and opponent's perspective.
+        """
+        start = time.time()
+        fights = new.sort_values(by="date", kind="mergesort").to_dict("records")
+        outdated = self.find_outdated(fights)
+        results = []
+        if outdated:
+            if history is None:
+                msg = "History is needed to recompute {} fighters".format(len(outdated))
+                raise ValueError(msg)
+            results.extend(self.recompute(outdated, fights, history))
+        for fight in fights:
+            if fight["fighter"] not in outdated:
+                results.extend(self.apply(fight))
+        logging.info(
+            "Updated {} fights, recomputed {} fighters in {:.2f}".format(
+                len(fights), len(outdated), time.time() - start
+            )
+        )
+        return results
+
+    def find_outdated(self, fights: List[Dict]) -> Set[Any]:
+        """Finds fighters that need to be recomputed, because new
+        fights are older than their last known fight. Opponents in
+        new fights of such fighters need to be recomputed too.
+
+        Args:
+            fights (List[Dict]): new fights.
+
+        Returns:
+            Set[Any]: fighters to recompute.
+        """
+        outdated = set()
+        for fight in fights:
+            date = Sequencer.parse_date(fight["date"])
+            for fighter in [fight["fighter"], fight["opponent"]]:
+                state = self.states.get(fighter)
+                if state is not None and date < state.stat.date:
+                    outdated.add(fighter)
+        changed = bool(outdated)
+        while changed:
+            changed = False
+            for fight in fights:
+                pair = {fight["fighter"], fight["opponent"]}
+                if pair & outdated and not pair <= outdated:
+                    outdated |= pair
+                    changed = True
+        return outdated
+
+    def apply(self, fight: Dict[str, Any]) -> List[Dict]:
+        """Transforms a single fight, updating both fighters' states.
+
+        Args:
+            fight (Dict[str, Any]): fight information.
+
+        Returns:
+            List[Dict]: stats from fighter's and opponent's perspective.
+        """
+        date = Sequencer.parse_date(fight["date"])
+        opponent_fight = dict(fight)
+        opponent_fight["fighter"] = fight["opponent"]
+        opponent_fight["opponent"] = fight["fighter"]
+        opponent_fight["result"] = "loss"
+        stats = []
+        for current in [fight, opponent_fight]:
+            state = self.states.get(current["fighter"])
+            if state is None:
+                stats.append((FighterStat(current, date, current["date"]), CumulativeStat()))
+            else:
+                stats.append(state.advance(current, date))
+        records = []
+        for stat, cumulative in stats:
+            record = stat.to_dict()
+            record["fighter"]["cumulative"] = cumulative.to_dict()
+            record["fighterid"] = record["fighter"]["id"]
+            records.append(record)
+        fighter, opponent = records
+        fighter["opponent"] = opponent["fighter"]
+        opponent["opponent"] = fighter["fighter"]
+        for (stat, cumulative), record in zip(stats, records):
+            self.states[record["fighterid"]] = FighterState(
+                stat, cumulative, record["opponent"]["history"]
+            )
+        return records
+
+    def recompute(
+        self, outdated: Set[Any], fights: List[Dict], history: pd.DataFrame
+    ) -> List[Dict]:
+        """Recomputes stats of fighters from their full history,
+        along with opponents who fought them since their earliest
+        new fight.
+
+        Args:
+            outdated (Set[Any]): fighters to recompute.
+            fights (List[Dict]): new fights.
+            history (pd.DataFrame): all fights, including new ones.
+
+        Returns:
+            List[Dict]: stats of recomputed fighters and of their opponents
+                since the fighters' earliest new fight.
+        """
+        earliest: Dict[Any, dt.date] = {}
+        for fight in fights:
+            date = Sequencer.parse_date(fight["date"])
+            for fighter in [fight["fighter"], fight["opponent"]]:
+                if fighter in outdated:
+                    earliest[fighter] = min(earliest.get(fighter, date), date)
+        # New fights of other fighters are applied after recomputing
+        pending = [fight["id"] for fight in fights if fight["fighter"] not in outdated]
+        history = history[~history["id"].isin(pending)]
+        # Opponents who fought outdated fighters since their earliest new
+        # fight have different cumulative stats and opponents' histories
+        changed = dict(earliest)
+        opposing = history[
+            history["fighter"].isin(outdated) | history["opponent"].isin(outdated)
+        ]
+        for fight in opposing.to_dict("records"):
+            date = Sequencer.parse_date(fight["date"])
+            pairs = [(fight["fighter"], fight["opponent"]), (fight["opponent"], fight["fighter"])]
+            for fighter, opponent in pairs:
+                if fighter not in outdated and opponent in outdated and date >= earliest[opponent]:
+                    changed[fighter] = min(changed.get(fighter, date), date)
+        # Stats depend on opponents' histories and the opponents' cumulative
+        # stats on their opponents', so two hops of fights are needed
+        involved = set(changed)
+        for _ in range(2):
+            subset = history[
+                history["fighter"].isin(involved) | history["opponent"].isin(involved)
+            ]
+            involved |= set(subset["fighter"]) | set(subset["opponent"])
+        subset = history[
+            history["fighter"].isin(involved) | history["opponent"].isin(involved)
+        ]
+        enriched = Sequencer.enrich(subset).to_dict("records")
+        raw = {(fight["id"], fight["fighter"]): fight for fight in enriched}
+        results = []
+        last: Dict[Any, Dict] = {}
+        for record in transform_batch(subset):
+            fighter = record["fighterid"]
+            opponent = record["opponent"]["id"]
+            # Stats of opponents of changed fighters include their cumulative stats
+            if any(
+                current in changed and record["date"] >= changed[current]
+                for current in [fighter, opponent]
+            ):
+                results.append(record)
+            if fighter in changed and (
+                fighter not in last or record["date"] >= last[fighter]["date"]
+            ):
+                last[fighter] = record
+        for fighter, record in last.items():
+            self.states[fighter] = FighterState(
+                FighterStat.from_dict(record, raw[(record["id"], fighter)]),
+                CumulativeStat.from_dict(record["fighter"]["cumulative"]),
+                record["opponent"]["history"],
+            )
+        return results
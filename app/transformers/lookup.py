@@ -0,0 +1,131 @@
+"""Looks up fighters' pre fight stats as of any date,
+without transforming their history again.
+"""
+import datetime as dt
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from app.transformers.export import STATS_COLUMNS, get_value
+from app.transformers.incremental import FighterState, IncrementalTransformer
+
+SINCE_LAST_FIGHT = STATS_COLUMNS.index("history.since_last_fight")
+
+
+class AsOfIndex:
+    """Keeps every fighter's fight dates sorted, along with the stats
+    before each fight and after the last one. Stats as of a date are
+    found with a binary search over the fighter's dates."""
+
+    def __init__(
+        self,
+        fighters: Dict[Any, int],
+        offsets: np.ndarray,
+        dates: np.ndarray,
+        rows: np.ndarray,
+    ) -> None:
+        """
+        Args:
+            fighters (Dict[Any, int]): position of every fighter.
+            offsets (np.ndarray): start of every fighter's dates,
+                with the total number of dates at the end.
+            dates (np.ndarray): fight dates of all fighters.
+            rows (np.ndarray): stats before each fight, followed by
+                stats after the last fight, for every fighter.
+        """
+        self.fighters = fighters
+        self.offsets = offsets
+        self.dates = dates
+        self.rows = rows
+
+    @classmethod
+    def build(
+        cls, records: Iterable[Dict[str, Any]], states: Dict[Any, FighterState]
+    ) -> "AsOfIndex":
+        """Builds the index from transformed stats and
+        fighters' states after their last fight.
+
+        Args:
+            records (Iterable[Dict[str, Any]]): transformed stats.
+            states (Dict[Any, FighterState]): fighters' states.
+
+        Returns:
+            AsOfIndex: the index.
+        """
+        history: Dict[Any, List[Dict[str, Any]]] = {}
+        for record in records:
+            history.setdefault(record["fighter"]["id"], []).append(record)
+        fighters = {}
+        offsets = [0]
+        dates = []
+        rows = []
+        for position, (fighter, stats) in enumerate(history.items()):
+            stats = sorted(stats, key=lambda record: record["date"])
+            fighters[fighter] = position
+            offsets.append(offsets[-1] + len(stats))
+            for record in stats:
+                dates.append(record["date"])
+                rows.append([get_value(record["fighter"], column) for column in STATS_COLUMNS])
+            state = states[fighter]
+            stat, cumulative = state.advance({}, state.stat.date)
+            counters = stat.counters.tolist()
+            rows.append(counters[:8] + [0] + counters[8:] + cumulative.counters.tolist())
+        return cls(
+            fighters,
+            np.array(offsets),
+            np.array(dates, dtype="datetime64[D]"),
+            np.array(rows, dtype=float),
+        )
+
+    @classmethod
+    def from_fights(cls, data: pd.DataFrame) -> "AsOfIndex":
+        """Transforms fights and builds the index from them.
+
+        Args:
+            data (pd.DataFrame): fights data.
+
+        Returns:
+            AsOfIndex: the index.
+        """
+        transformer = IncrementalTransformer()
+        records = transformer.update(data)
+        return cls.build(records, transformer.states)
+
+    def query(self, fighters: List[Any], dates: List[dt.date]) -> np.ndarray:
+        """Finds stats of fighters as of given dates, for example
+        for every fight on a fight card. Fighters without known
+        fights get zero stats.
+
+        Args:
+            fighters (List[Any]): fighters' ids.
+            dates (List[dt.date]): dates of upcoming fights.
+
+        Returns:
+            np.ndarray: stats with STATS_COLUMNS for every query.
+        """
+        result = np.zeros((len(fighters), len(STATS_COLUMNS)))
+        days = np.array(dates, dtype="datetime64[D]")
+        for i, (fighter, day) in enumerate(zip(fighters, days)):
+            position = self.fighters.get(fighter)
+            if position is None:
+                continue
+            start, end = self.offsets[position], self.offsets[position + 1]
+            fights = np.searchsorted(self.dates[start:end], day, side="left")
+            result[i] = self.rows[start + position + fights]
+            if fights:
+                last = self.dates[start + fights - 1]
+                result[i, SINCE_LAST_FIGHT] = (day - last).astype(int)
+        return result
+
+    def lookup(self, fighter: Any, date: dt.date) -> Dict[str, float]:
+        """Finds stats of a fighter as of a given date.
+
+        Args:
+            fighter (Any): fighter's id.
+            date (dt.date): date of an upcoming fight.
+
+        Returns:
+            Dict[str, float]: stats by column name.
+        """
+        return dict(zip(STATS_COLUMNS, self.query([fighter], [date])[0].tolist()))
@@ -1,18 +1,349 @@
 """Responsible for sequencing fights data in time."""
-import copy
 import time
 import datetime as dt
-from typing import Any, Dict, List
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
 
+import numpy as np
 import pandas as pd
 
 
+KNOCKOUT_FLAGS = ["ko", "punches", "knockout", "cut", "towel", "kick"]
+SUBMISSION_FLAGS = [
+    "sub",
+    "mata",
+    "armbar",
+    "choke",
+    "isaac",
+    "tapout",
+    "ubmission",
+    "forfeit",
+]
+
+
+def group_by_id(data: Iterable[Dict], key: str = "id") -> Dict[Any, List[Dict]]:
+    """Groups data points by their id in a single pass.
+    Groups are ordered by the first occurrence of the id.
+
+    Args:
+        data (Iterable[Dict]): data points.
+        key (str, optional): name of the id field. Defaults to "id".
+
+    Returns:
+        Dict[Any, List[Dict]]: data points grouped by id.
+    """
+    groups: Dict[Any, List[Dict]] = {}
+    for point in data:
+        groups.setdefault(point[key], []).append(point)
+    return groups
+
+
+def classify_method(method: Any) -> str:
+    """Assigns a fight's method to one of: decision,
+    knockout or submission.
+
+    Args:
+        method (Any): method as parsed from the website.
+
+    Returns:
+        str: method's category.
+    """
+    category = "decision"
+    for flag in KNOCKOUT_FLAGS:
+        if flag in str(method):
+            category = "knockout"
+    for flag in SUBMISSION_FLAGS:
+        if flag in str(method):
+            category = "submission"
+    return category
+
+
+RESULTS = ["win", "loss"]
+METHODS = ["total", "decision", "submission", "knockout"]
+# Layout of FighterStat counters: win and loss counts by method,
+# followed by the other history stats and streaks
+FIGHTS, TIME, POSITIONS, WIN_STREAK, LOSS_STREAK = range(8, 13)
+
+
+class FighterStat:
+    """Compact pre fight stats of a fighter. Counters are kept in
+    a fixed layout array and copied only when stats for the next
+    fight are derived, so previous stats are never modified."""
+
+    __slots__ = ("fight", "date", "started", "since_last_fight", "counters")
+
+    def __init__(
+        self,
+        fight: Dict[str, Any],
+        date: dt.date,
+        started: str,
+        since_last_fight: int = 0,
+        counters: Optional[array] = None,
+    ) -> None:
+        self.fight = fight
+        self.date = date
+        self.started = started
+        self.since_last_fight = since_last_fight
+        self.counters = counters if counters is not None else array("d", [0.0] * 13)
+
+    @classmethod
+    def from_dict(cls, stat: Dict[str, Any], fight: Dict[str, Any]) -> "FighterStat":
+        """Creates stats from a nested statistics dict.
+
+        Args:
+            stat (Dict[str, Any]): statistics dict.
+            fight (Dict[str, Any]): fight the stats were created for.
+
+        Returns:
+            FighterStat: compact stats.
+        """
+        history = stat["fighter"]["history"]
+        counters = array("d", [0.0] * 13)
+        for i, result in enumerate(RESULTS):
+            for j, method in enumerate(METHODS):
+                counters[i * 4 + j] = history[result][method]
+        counters[FIGHTS] = history["fights"]
+        counters[TIME] = history["time"]
+        counters[POSITIONS] = history["positions"]
+        counters[WIN_STREAK] = stat["fighter"]["streak"]["win"]
+        counters[LOSS_STREAK] = stat["fighter"]["streak"]["loss"]
+        return cls(
+            fight,
+            stat["date"],
+            stat["fighter"]["started"],
+            history["since_last_fight"],
+            counters,
+        )
+
+    def advance(self, fight: Dict[str, Any], date: dt.date) -> "FighterStat":
+        """Creates stats for the next fight, adding the result
+        of the fight these stats were created for.
+
+        Args:
+            fight (Dict[str, Any]): next fight information.
+            date (dt.date): date of the next fight.
+
+        Returns:
+            FighterStat: stats before the next fight.
+        """
+        counters = self.counters[:]
+        previous = self.fight
+        result = previous["result"].lower()
+        offset = RESULTS.index(result) * len(METHODS)
+        counters[offset] += 1.0
+        counters[offset + METHODS.index(classify_method(previous["method"]))] += 1.0
+        if result == "win":
+            counters[WIN_STREAK] += 1.0
+            counters[LOSS_STREAK] = 0.0
+        else:
+            counters[LOSS_STREAK] += 1.0
+            counters[WIN_STREAK] = 0.0
+        counters[FIGHTS] += 1.0
+        fight_time = float(previous["time"])
+        counters[TIME] += fight_time if fight_time >= 0 else 5.0
+        counters[POSITIONS] += float(previous["position"])
+        since_last_fight = (date - self.date).days
+        return FighterStat(fight, date, self.started, since_last_fight, counters)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Turns stats into a nested statistics dict.
+
+        Returns:
+            Dict[str, Any]: statistics dict.
+        """
+        fight = self.fight
+        counters = self.counters.tolist()
+        history: Dict[str, Any] = {
+            result: dict(zip(METHODS, counters[i * 4 : i * 4 + 4]))
+            for i, result in enumerate(RESULTS)
+        }
+        history["since_last_fight"] = self.since_last_fight
+        history["fights"] = counters[FIGHTS]
+        history["time"] = counters[TIME]
+        history["positions"] = counters[POSITIONS]
+        return {
+            "id": fight["id"],
+            "date": self.date,
+            "location": fight["location"],
+            "organization": fight["organization"],
+            "title": fight["title"],
+            "fighter": {
+                "started": self.started,
+                "id": fight["fighter"],
+                "history": history,
+                "streak": {
+                    "win": counters[WIN_STREAK],
+                    "loss": counters[LOSS_STREAK],
+                },
+            },
+            "result": fight["result"],
+            "method": fight["method"],
+            "details": fight["details"],
+        }
+
+
+class CumulativeStat:
+    """Compact cumulative stats of a fighter's opponents, grouped by
+    the fighter's result and the opponents' history. Counters are
+    copied only when the next stats are derived."""
+
+    __slots__ = ("counters",)
+
+    def __init__(self, counters: Optional[array] = None) -> None:
+        self.counters = counters if counters is not None else array("d", [0.0] * 16)
+
+    @classmethod
+    def from_dict(cls, cumulative: Dict[str, Any]) -> "CumulativeStat":
+        """Creates stats from a nested cumulative dict.
+
+        Args:
+            cumulative (Dict[str, Any]): cumulative dict.
+
+        Returns:
+            CumulativeStat: compact stats.
+        """
+        counters = array(
+            "d",
+            [
+                cumulative[placement][result][method]
+                for placement in RESULTS
+                for result in RESULTS
+                for method in METHODS
+            ],
+        )
+        return cls(counters)
+
+    def add(self, placement: str, history: Dict[str, Any]) -> "CumulativeStat":
+        """Creates next stats by adding opponent's history.
+
+        Args:
+            placement (str): fighter's result against the opponent.
+            history (Dict[str, Any]): opponent's history stats.
+
+        Returns:
+            CumulativeStat: updated stats.
+        """
+        counters = self.counters[:]
+        offset = RESULTS.index(placement) * 8
+        for i, result in enumerate(RESULTS):
+            for j, method in enumerate(METHODS):
+                counters[offset + i * 4 + j] += history[result][method]
+        return CumulativeStat(counters)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Turns stats into a nested cumulative dict.
+
+        Returns:
+            Dict[str, Any]: cumulative dict.
+        """
+        counters = self.counters.tolist()
+        return {
+            placement: {
+                result: dict(zip(METHODS, counters[p * 8 + i * 4 : p * 8 + i * 4 + 4]))
+                for i, result in enumerate(RESULTS)
+            }
+            for p, placement in enumerate(RESULTS)
+        }
+
+
+def group_bounds(keys: np.ndarray) -> List[Tuple[int, int]]:
+    """Finds ranges of equal values in sorted keys.
+
+    Args:
+        keys (np.ndarray): sorted keys.
+
+    Returns:
+        List[Tuple[int, int]]: start and end of every range.
+    """
+    if not len(keys):
+        return []
+    bounds = (np.flatnonzero(keys[1:] != keys[:-1]) + 1).tolist()
+    return list(zip([0] + bounds, bounds + [len(keys)]))
+
+
+def flatten_columns(data: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Splits columns of nested stats dicts into a column per stat,
+    named by its path, like opponent.history.win.total. Numeric
+    stats become numeric arrays instead of arrays of dicts.
+
+    Args:
+        data (pd.DataFrame): data, possibly with nested stats dicts.
+
+    Returns:
+        Dict[str, np.ndarray]: flat columns.
+    """
+    columns = {}
+    for column in data.columns:
+        values = data[column]
+        if len(values) and isinstance(values.iloc[0], dict):
+            flat = pd.json_normalize(values.tolist())
+            for key in flat.columns:
+                columns["{}.{}".format(column, key)] = flat[key].to_numpy()
+        else:
+            columns[column] = values.to_numpy()
+    return columns
+
+
+def nest_columns(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Turns a row of flat columns back into nested stats dicts.
+
+    Args:
+        row (Dict[str, Any]): row with columns named by paths.
+
+    Returns:
+        Dict[str, Any]: row with nested stats dicts.
+    """
+    nested: Dict[str, Any] = {}
+    for key, value in row.items():
+        *path, name = key.split(".")
+        current = nested
+        for part in path:
+            current = current.setdefault(part, {})
+        current[name] = value
+    return nested
+
+
+def shard_rows(shard: Dict[str, np.ndarray]) -> List[Dict]:
+    """Turns flat columns of a shard back into rows with nested stats.
+
+    Args:
+        shard (Dict[str, np.ndarray]): flat fights columns.
+
+    Returns:
+        List[Dict]: fights with nested stats dicts.
+    """
+    columns = {column: values.tolist() for column, values in shard.items()}
+    return [nest_columns(dict(zip(columns.keys(), row))) for row in zip(*columns.values())]
+
+
+def build_shard(transformer: type, shard: Dict[str, np.ndarray]) -> List[Dict]:
+    """Builds stats for all fighters in a shard.
+    Runs in a worker process.
+
+    Args:
+        transformer (type): Sequencer class used to build stats.
+        shard (Dict[str, np.ndarray]): flat fights columns sorted by fighter
+            and date.
+
+    Returns:
+        List[Dict]: stats of the shard's fighters.
+    """
+    return transformer().transform_shard(shard)
+
+
 class Sequencer:
     """Transforms fights stats into sequences of pre fight stats."""
 
-    def __init__(self):
+    fighter_column = "fighter"
+
+    def __init__(self, workers: int = 1):
+        """
+        :param workers: number of processes building stats
+        """
         self.data = None
+        self.workers = workers
 
     def fit(self, data):
         """
@@ -36,7 +367,7 @@ class Sequencer:
         )
         opponent["result"] = "loss"
         data = data.append(opponent)
-        data = data.sort_values(by=["fighter"])
+        data = data.sort_values(by=["fighter"], kind="mergesort")
         return data
 
     @staticmethod
@@ -51,106 +382,6 @@ class Sequencer:
         """
         return dt.datetime.strptime(datestr, "%Y-%m-%d").date()
 
-    def create_init_stat(self, current_fight: Dict[str, Any]) -> Dict[str, Any]:
-        """Creates base statictis dict and initiates
-        it with zero values.
-
-        Args:
-            current_fight (Dict[str, Any]): fight information.
-
-        Returns:
-            Dict[str, Any]: statistics dict.
-        """
-        return {
-            "id": current_fight["id"],
-            "date": self.parse_date(current_fight["date"]),
-            "location": current_fight["location"],
-            "organization": current_fight["organization"],
-            "title": current_fight["title"],
-            "fighter": {
-                "started": current_fight["date"],
-                "id": current_fight["fighter"],
-                "history": {
-                    "win": {
-                        "total": 0.0,
-                        "decision": 0.0,
-                        "submission": 0.0,
-                        "knockout": 0.0,
-                    },
-                    "loss": {
-                        "total": 0.0,
-                        "decision": 0.0,
-                        "submission": 0.0,
-                        "knockout": 0.0,
-                    },
-                    "since_last_fight": 0,
-                    "fights": 0.0,
-                    "time": 0.0,
-                    "positions": 0.0,
-                },
-                "streak": {"win": 0.0, "loss": 0.0},
-            },
-            "result": current_fight["result"],
-            "method": current_fight["method"],
-            "details": current_fight["details"],
-        }
-
-    def create_stat(
-        self,
-        current_stat,
-        previous_stat,
-        current_fight,
-        previous_fight,
-    ):
-        current_stat["id"] = current_fight["id"]
-        current_stat["date"] = self.parse_date(current_fight["date"])
-        for key in ["location", "result", "method", "details", "organization", "title"]:
-            current_stat[key] = current_fight[key]
-
-        # Add result from past fight
-        result = previous_fight["result"].lower()
-        current_stat["fighter"]["history"][result]["total"] += 1.0
-        if result == "win":
-            current_stat["fighter"]["streak"]["win"] += 1.0
-            current_stat["fighter"]["streak"]["loss"] = 0.0
-        else:
-            current_stat["fighter"]["streak"]["loss"] += 1.0
-            current_stat["fighter"]["streak"]["win"] = 0.0
-        # Increase results and method scores
-        method = "decision"
-        knockout_flags = ["ko", "punches", "knockout", "cut", "towel", "kick"]
-        for flag in knockout_flags:
-            if flag in str(previous_fight["method"]):
-                method = "knockout"
-        submission_flags = [
-            "sub",
-            "mata",
-            "armbar",
-            "choke",
-            "isaac",
-            "tapout",
-            "ubmission",
-            "forfeit",
-        ]
-        for flag in submission_flags:
-            if flag in str(previous_fight["method"]):
-                method = "submission"
-        current_stat["fighter"]["history"][result][method] += 1.0
-
-        # Add stats
-        current_stat["fighter"]["history"]["since_last_fight"] = (
-            current_stat["date"] - previous_stat["date"]
-        ).days
-        current_stat["fighter"]["history"]["fights"] += 1.0
-        if float(previous_fight["time"]) < 0:
-            previous_fight["time"] = 5.0
-        current_stat["fighter"]["history"]["time"] += float(previous_fight["time"])
-        current_stat["fighter"]["history"]["positions"] += float(
-            previous_fight["position"]
-        )
-
-        return current_stat
-
     def get_fights_for_fighter(self, name: str) -> List[Dict]:
         """Extracts all fights for a given fighter.
 
@@ -166,6 +397,89 @@ class Sequencer:
         result = sorted(fights_list, key=lambda x: self.parse_date(x["date"]))
         return result
 
+    def sort_fights(self) -> pd.DataFrame:
+        """Sorts data by fighter and date, so fights of each
+        fighter are a contiguous range of rows."""
+        return self.data.sort_values(by=[self.fighter_column, "date"], kind="mergesort")
+
+    def iter_fights(self) -> Iterator[Tuple[Any, List[Dict]]]:
+        """Yields every fighter along with his fights sorted from
+        oldest to newest. Data is sorted once by fighter and date,
+        so fights of each fighter are a contiguous range of rows.
+
+        Yields:
+            Tuple[Any, List[Dict]]: fighter's id and his fights.
+        """
+        data = self.sort_fights()
+        fights = data.to_dict("records")
+        fighters = data[self.fighter_column].to_numpy()
+        for start, end in group_bounds(fighters):
+            yield fighters[start], fights[start:end]
+
+    def split_shards(self, num_shards: int) -> List[Dict[str, np.ndarray]]:
+        """Splits data into shards of whole fighters with similar
+        number of fights. Shards are kept as flat column arrays,
+        with nested stats split into numeric columns, so they are
+        cheap to pass to other processes.
+
+        Args:
+            num_shards (int): maximal number of shards.
+
+        Returns:
+            List[Dict[str, np.ndarray]]: shards in fighter order.
+        """
+        data = self.sort_fights()
+        fighters = data[self.fighter_column].to_numpy()
+        starts = np.array([start for start, _ in group_bounds(fighters)], dtype=int)
+        targets = np.linspace(0, len(fighters), num_shards + 1)[1:-1]
+        positions = np.searchsorted(starts, targets).clip(max=max(len(starts) - 1, 0))
+        cuts = np.unique(starts[positions]) if len(starts) else []
+        bounds = [0] + [int(cut) for cut in cuts if cut > 0] + [len(fighters)]
+        columns = flatten_columns(data)
+        return [
+            {column: values[start:end] for column, values in columns.items()}
+            for start, end in zip(bounds[:-1], bounds[1:])
+            if start < end
+        ]
+
+    def transform_parallel(self) -> List[Dict]:
+        """Builds stats of fighters' shards in a pool of processes.
+        Results are merged in fighter order, so they are the same
+        as from a sequential transformation.
+
+        Returns:
+            List[Dict]: transformed stats.
+        """
+        start = time.time()
+        shards = self.split_shards(self.workers * 4)
+        transformed = []
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            jobs = [executor.submit(build_shard, type(self), shard) for shard in shards]
+            for i, job in enumerate(jobs):
+                transformed.extend(job.result())
+                logging.info(
+                    "Transformed {} out of {} shards in {:.2f}".format(
+                        i + 1, len(shards), time.time() - start
+                    )
+                )
+        return transformed
+
+    def transform_shard(self, shard: Dict[str, np.ndarray]) -> List[Dict]:
+        """Builds stats for all fighters in a shard.
+
+        Args:
+            shard (Dict[str, np.ndarray]): flat fights columns sorted by
+                fighter and date.
+
+        Returns:
+            List[Dict]: stats of the shard's fighters.
+        """
+        fights = shard_rows(shard)
+        stats = []
+        for start, end in group_bounds(shard[self.fighter_column]):
+            stats.extend(self.build_stats(fights[start:end]))
+        return stats
+
     def get_fighters(self) -> List[str]:
         """
         Extracts a list of fighters names.
@@ -181,69 +495,73 @@ class Sequencer:
         :param fights: fighter's fights
         :return: enhanced data about fighter
         """
-        stats = []
-        for i, current_fight in enumerate(fights, 0):
-            if i == 0:
-                current_stat = self.create_init_stat(current_fight)
+        stats: List[FighterStat] = []
+        for current_fight in fights:
+            date = self.parse_date(current_fight["date"])
+            if not stats:
+                current_stat = FighterStat(current_fight, date, current_fight["date"])
             else:
                 # Combine information form previous fights
-                current_stat = copy.deepcopy(stats[i - 1])
-                previous_stat = copy.deepcopy(stats[i - 1])
-                previous_fight = copy.deepcopy(fights[i - 1])
-                # Update stats with current information
-                current_stat = self.create_stat(
-                    current_stat,
-                    previous_stat,
-                    current_fight,
-                    previous_fight,
-                )
+                current_stat = stats[-1].advance(current_fight, date)
             stats.append(current_stat)
 
-        return stats
+        return [stat.to_dict() for stat in stats]
 
     @staticmethod
     def exchange(data):
-        result = []
-        ids = list(set([point["id"] for point in data]))
+        """Adds opponent's stats to every data point. Data points
+        are paired by fight id, so the fighter gets the opponent's
+        stats and vice versa.
+
+        Args:
+            data (Union[pd.DataFrame, List[Dict]]): transformed stats.
+
+        Returns:
+            List[Dict]: data points with opponent's stats.
+        """
+        if isinstance(data, pd.DataFrame):
+            data = data.to_dict("records")
         start = time.time()
-        for i, idx in enumerate(ids):
-            if i % 1000 == 0:
-                logging.info(
-                    "Exchanging data {} from {} in {:.2f}".format(
-                        i, len(ids), time.time() - start
-                    )
+        result = []
+        unpaired = []
+        for idx, group in group_by_id(data).items():
+            if len(group) != 2:
+                unpaired.append(idx)
+                continue
+            fighter, opponent = group
+            fighter["opponent"] = opponent["fighter"]
+            opponent["opponent"] = fighter["fighter"]
+            # Append new data points
+            result.append(fighter)
+            result.append(opponent)
+        if unpaired:
+            logging.warning(
+                "Unable to exchange {} fights, e.g. {}".format(
+                    len(unpaired), ", ".join(map(str, unpaired[:5]))
                 )
-                start = time.time()
-            pair = []
-            for current in data:
-                if current["id"] == idx:
-                    pair.append(current)
-            if len(pair) == 2:
-                fighter, opponent = pair
-                fighter["opponent"] = opponent["fighter"]
-                opponent["opponent"] = fighter["fighter"]
-                # Append new data points
-                result.append(fighter)
-                result.append(opponent)
-            else:
-                logging.warning("Error exchanging {}".format(i))
-
+            )
+        logging.info(
+            "Exchanged {} data points in {:.2f}".format(
+                len(result), time.time() - start
+            )
+        )
         return result
 
     def transform(self):
         """Transforms fight stats into sequences."""
+        if self.workers > 1:
+            return pd.DataFrame(self.transform_parallel())
         transformed = []
-        fighters = self.get_fighters()
+        num_of_fighters = self.data[self.fighter_column].nunique()
         start = time.time()
-        for i, fighter in enumerate(fighters):
+        for i, (_, fights) in enumerate(self.iter_fights()):
             if i % 1000 == 0:
                 logging.info(
                     "Working on {} fighter out of {} in {:.2f}".format(
-                        i, len(fighters), time.time() - start
+                        i, num_of_fighters, time.time() - start
                     )
                 )
                 start = time.time()
-            fights = self.get_fights_for_fighter(fighter)
             current = self.build_stats(fights)
             transformed.extend(current)
         return pd.DataFrame(transformed)
@@ -255,20 +573,17 @@ class Sequencer:
 
 
 class Cumulator(Sequencer):
-    def __init__(self):
-        super().__init__()
-        self.transformed = []
+    fighter_column = "fighterid"
 
     def fit(self, data):
         """Saves the data for transformation."""
         self.data = pd.DataFrame(data)
-        self.data["fighterid"] = self.data["fighter"].apply(lambda x: x["id"])
-        self.data = self.data.sort_values(by="date")
+        self.data["fighterid"] = [fighter["id"] for fighter in self.data["fighter"]]
+        self.data = self.data.sort_values(by="date", kind="mergesort")
 
     def get_fighters(self):
         """Returns a list of fighter's names."""
-        fighter_ids = self.data["fighter"].apply(lambda x: x["id"])
-        return fighter_ids.unique().tolist()  # ['/fighter/Georges-St-Pierre-3500']
+        return self.data["fighterid"].unique().tolist()
 
     def get_fights_for_fighter(self, name):
         """Extracts all fights for a specific fighter."""
@@ -281,70 +596,15 @@ class Cumulator(Sequencer):
     def build_stats(self, fights):
         """Build cumulative stats for fighter."""
         stats = []
-        raw = {
-            "win": {
-                "win": {
-                    "total": 0.0,
-                    "decision": 0.0,
-                    "submission": 0.0,
-                    "knockout": 0.0,
-                },
-                "loss": {
-                    "total": 0.0,
-                    "decision": 0.0,
-                    "submission": 0.0,
-                    "knockout": 0.0,
-                },
-            },
-            "loss": {
-                "win": {
-                    "total": 0.0,
-                    "decision": 0.0,
-                    "submission": 0.0,
-                    "knockout": 0.0,
-                },
-                "loss": {
-                    "total": 0.0,
-                    "decision": 0.0,
-                    "submission": 0.0,
-                    "knockout": 0.0,
-                },
-            },
-        }
+        cumulative = CumulativeStat()
         for i, fight in enumerate(fights):
-            fight = copy.deepcopy(fight)
-            if i == 0:
-                fight["fighter"]["cumulative"] = raw
-                stats.append(fight)
-            else:
-                fight["fighter"]["cumulative"] = copy.deepcopy(
-                    stats[i - 1]["fighter"]["cumulative"]
-                )
-                previous_stat = stats[i - 1]
-                placement = previous_stat["result"].lower()
-                for result in ["win", "loss"]:
-                    for method in fight["opponent"]["history"][result].keys():
-                        fight["fighter"]["cumulative"][placement][result][
-                            method
-                        ] += previous_stat["opponent"]["history"][result][method]
-                stats.append(fight)
+            if i > 0:
+                previous = fights[i - 1]
+                placement = previous["result"].lower()
+                cumulative = cumulative.add(placement, previous["opponent"]["history"])
+            fight = dict(fight)
+            fight["fighter"] = dict(fight["fighter"])
+            fight["fighter"]["cumulative"] = cumulative.to_dict()
+            stats.append(fight)
 
         return stats
-
-    def transform(self):
-        """Transforms fight stats into sequences."""
-        fighters = self.get_fighters()
-        start = time.time()
-        num_of_fighters = len(fighters)
-        for i, fighter in enumerate(fighters):
-            if i % 1000 == 0:
-                logging.info(
-                    "Transformed {} out of {} stats for {:.2f} seconds".format(
-                        i, num_of_fighters, time.time() - start
-                    )
-                )
-                start = time.time()
-            fights = self.get_fights_for_fighter(fighter)
-            current = self.build_stats(fights)
-            self.transformed.extend(current)  # not append!
-        return pd.DataFrame(self.transformed)
@@ -0,0 +1,103 @@
+"""Transforms fights in partitions of fighters, so only
+a bounded number of nested stats dicts is kept in memory.
+Stats of all fighters are computed as compact columns first,
+since every fighter's stats depend on his opponents'.
+"""
+import logging
+import time
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.transformers.sherdog import CumulativeStat, group_bounds
+from app.transformers.vectorized import (
+    HISTORY_COLUMNS,
+    VectorizedSequencer,
+    nest_stats,
+    opponents_history,
+    previous_sums,
+)
+
+
+def find_partners(ids: np.ndarray) -> np.ndarray:
+    """Finds the other perspective of every fight.
+
+    Args:
+        ids (np.ndarray): fight ids, each appearing exactly twice.
+
+    Returns:
+        np.ndarray: row of the other perspective for every row.
+    """
+    order = np.argsort(ids, kind="mergesort")
+    partners = np.empty(len(ids), dtype=int)
+    partners[order[0::2]] = order[1::2]
+    partners[order[1::2]] = order[0::2]
+    return partners
+
+
+def split_partitions(fighters: np.ndarray, size: int) -> List[Tuple[int, int]]:
+    """Splits rows sorted by fighter into ranges of whole fighters
+    with about size rows each.
+
+    Args:
+        fighters (np.ndarray): sorted fighters' ids.
+        size (int): number of rows in a partition.
+
+    Returns:
+        List[Tuple[int, int]]: start and end of every partition.
+    """
+    partitions = []
+    start = 0
+    for _, end in group_bounds(fighters):
+        if end - start >= size:
+            partitions.append((start, end))
+            start = end
+    if start < len(fighters):
+        partitions.append((start, len(fighters)))
+    return partitions
+
+
+def iter_partitions(data: pd.DataFrame, size: int = 10000) -> Iterator[List[Dict]]:
+    """Transforms fights into the same stats as transform_batch,
+    yielding them in partitions of fighters.
+
+    Args:
+        data (pd.DataFrame): fights data.
+        size (int, optional): number of stats in a partition. Defaults to 10000.
+
+    Yields:
+        List[Dict]: stats of a partition of fighters.
+    """
+    start = time.time()
+    sequencer = VectorizedSequencer()
+    sequencer.fit(data)
+    stats = sequencer.transform_flat()
+    # Keep fights seen from both perspectives, the same as exchange does
+    counts = stats.groupby("id")["id"].transform("size").to_numpy()
+    stats = stats[counts == 2].reset_index(drop=True)
+    partners = find_partners(stats["id"].to_numpy())
+    history = stats[HISTORY_COLUMNS[:8]].iloc[partners].reset_index(drop=True)
+    history.columns = [column.replace("fighter.", "opponent.", 1) for column in history]
+    fighters = stats["fighter.id"].to_numpy()
+    cumulative = previous_sums(
+        opponents_history(history, stats["result"]), fighters
+    ).to_numpy()
+    del history
+    logging.info("Computed {} stats in {:.2f}".format(len(stats), time.time() - start))
+
+    for begin, end in split_partitions(fighters, size):
+        rows = np.arange(begin, end)
+        records = nest_stats(stats.iloc[rows])
+        opponents = nest_stats(stats.iloc[partners[rows]])
+        for record, opponent, row in zip(records, opponents, rows):
+            record["fighter"]["cumulative"] = CumulativeStat(
+                array("d", cumulative[row])
+            ).to_dict()
+            opponent["fighter"]["cumulative"] = CumulativeStat(
+                array("d", cumulative[partners[row]])
+            ).to_dict()
+            record["opponent"] = opponent["fighter"]
+            record["fighterid"] = record["fighter"]["id"]
+        yield records
@@ -0,0 +1,365 @@
+"""Computes pre fight stats for whole columns at once.
+Every stat is a cumulative sum or a run length of previous
+fights within a fighter, so it can be calculated with shifted
+cumulative sums over sorted NumPy arrays.
+"""
+import logging
+import time
+from array import array
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app.transformers.sherdog import (
+    METHODS,
+    RESULTS,
+    Cumulator,
+    CumulativeStat,
+    Sequencer,
+    classify_method,
+    shard_rows,
+)
+
+HISTORY_COLUMNS = [
+    "fighter.history.{}.{}".format(result, method)
+    for result in RESULTS
+    for method in METHODS
+] + [
+    "fighter.history.since_last_fight",
+    "fighter.history.fights",
+    "fighter.history.time",
+    "fighter.history.positions",
+]
+STREAK_COLUMNS = ["fighter.streak.win", "fighter.streak.loss"]
+STAT_COLUMNS = HISTORY_COLUMNS + STREAK_COLUMNS
+
+
+def group_starts(keys: np.ndarray) -> np.ndarray:
+    """Marks rows that start a new group in sorted keys.
+
+    Args:
+        keys (np.ndarray): sorted group keys.
+
+    Returns:
+        np.ndarray: boolean mask of the first row of each group.
+    """
+    starts = np.ones(len(keys), dtype=bool)
+    if len(keys) > 1:
+        starts[1:] = keys[1:] != keys[:-1]
+    return starts
+
+
+def run_lengths(starts: np.ndarray) -> np.ndarray:
+    """Calculates position of every row within its run,
+    counting from 1.
+
+    Args:
+        starts (np.ndarray): boolean mask of the first row of each run.
+
+    Returns:
+        np.ndarray: run lengths up to and including every row.
+    """
+    index = np.arange(len(starts))
+    start_index = np.maximum.accumulate(np.where(starts, index, 0))
+    return index - start_index + 1
+
+
+def shift(values: np.ndarray, starts: np.ndarray, fill: Any) -> np.ndarray:
+    """Shifts values by one row within groups.
+
+    Args:
+        values (np.ndarray): values sorted by group.
+        starts (np.ndarray): boolean mask of the first row of each group.
+        fill (Any): value for the first row of each group.
+
+    Returns:
+        np.ndarray: values of the previous row in the same group.
+    """
+    shifted = np.empty_like(values)
+    shifted[1:] = values[:-1]
+    shifted[starts] = fill
+    return shifted
+
+
+def previous_sum(values: np.ndarray, groups: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Sums values of all previous rows within groups.
+
+    Args:
+        values (np.ndarray): values sorted by group.
+        groups (np.ndarray): group number of every row.
+        starts (np.ndarray): boolean mask of the first row of each group.
+
+    Returns:
+        np.ndarray: sums of values before every row.
+    """
+    shifted = shift(values.astype(float), starts, 0.0)
+    return pd.Series(shifted).groupby(groups).cumsum().to_numpy()
+
+
+def compute_stats(data: pd.DataFrame, fighter_column: str = "fighter") -> pd.DataFrame:
+    """Computes pre fight stats for every fight in data.
+
+    Args:
+        data (pd.DataFrame): fights from both perspectives,
+            sorted by fighter and date.
+        fighter_column (str, optional): column with fighter's id.
+            Defaults to "fighter".
+
+    Returns:
+        pd.DataFrame: fight info and flat stats columns.
+    """
+    fighters = data[fighter_column].to_numpy()
+    starts = group_starts(fighters)
+    groups = np.cumsum(starts) - 1
+    dates = pd.to_datetime(data["date"], format="%Y-%m-%d")
+
+    is_win = data["result"].str.lower().to_numpy() == "win"
+    methods = data["method"].map(classify_method).to_numpy()
+    times = data["time"].to_numpy(dtype=float)
+    times = np.where(times < 0, 5.0, times)
+
+    stats: Dict[str, Any] = {
+        "id": data["id"].to_numpy(),
+        "date": dates.dt.date.to_numpy(),
+        "location": data["location"].to_numpy(),
+        "organization": data["organization"].to_numpy(),
+        "title": data["title"].to_numpy(),
+        "fighter.started": data["date"].to_numpy()[
+            np.maximum.accumulate(np.where(starts, np.arange(len(starts)), 0))
+        ],
+        "fighter.id": fighters,
+    }
+    for result, mask in [("win", is_win), ("loss", ~is_win)]:
+        column = "fighter.history.{}.".format(result)
+        stats[column + "total"] = previous_sum(mask, groups, starts)
+        for method in METHODS[1:]:
+            stats[column + method] = previous_sum(
+                mask & (methods == method), groups, starts
+            )
+    days = dates.to_numpy().astype("datetime64[D]").astype(np.int64)
+    stats["fighter.history.since_last_fight"] = days - shift(days, starts, 0)
+    stats["fighter.history.since_last_fight"][starts] = 0
+    stats["fighter.history.fights"] = (run_lengths(starts) - 1).astype(float)
+    stats["fighter.history.time"] = previous_sum(times, groups, starts)
+    stats["fighter.history.positions"] = previous_sum(
+        data["position"].to_numpy(dtype=float), groups, starts
+    )
+    # Streak after a fight is the length of the current run of equal results
+    streaks = run_lengths(starts | (is_win != shift(is_win, starts, False)))
+    stats["fighter.streak.win"] = shift(
+        np.where(is_win, streaks, 0).astype(float), starts, 0.0
+    )
+    stats["fighter.streak.loss"] = shift(
+        np.where(is_win, 0, streaks).astype(float), starts, 0.0
+    )
+    for key in ["result", "method", "details"]:
+        stats[key] = data[key].to_numpy()
+    return pd.DataFrame(stats)
+
+
+def nest_stats(stats: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Turns flat stats columns into nested fighter dicts,
+    the same as created by Sequencer.
+
+    Args:
+        stats (pd.DataFrame): stats as computed by compute_stats.
+
+    Returns:
+        List[Dict[str, Any]]: list of stats.
+    """
+    columns = {column: stats[column].tolist() for column in stats.columns}
+    nested = []
+    for i in range(len(stats)):
+        history: Dict[str, Any] = {
+            result: {
+                method: columns["fighter.history.{}.{}".format(result, method)][i]
+                for method in METHODS
+            }
+            for result in RESULTS
+        }
+        for key in ["since_last_fight", "fights", "time", "positions"]:
+            history[key] = columns["fighter.history." + key][i]
+        nested.append(
+            {
+                "id": columns["id"][i],
+                "date": columns["date"][i],
+                "location": columns["location"][i],
+                "organization": columns["organization"][i],
+                "title": columns["title"][i],
+                "fighter": {
+                    "started": columns["fighter.started"][i],
+                    "id": columns["fighter.id"][i],
+                    "history": history,
+                    "streak": {
+                        "win": columns["fighter.streak.win"][i],
+                        "loss": columns["fighter.streak.loss"][i],
+                    },
+                },
+                "result": columns["result"][i],
+                "method": columns["method"][i],
+                "details": columns["details"][i],
+            }
+        )
+    return nested
+
+
+class VectorizedSequencer(Sequencer):
+    """Transforms fights stats into sequences of pre fight stats,
+    computing all of them at once instead of fight by fight."""
+
+    def transform_flat(self) -> pd.DataFrame:
+        """Transforms fight stats into sequences with flat stats columns."""
+        start = time.time()
+        data = self.data.sort_values(by=[self.fighter_column, "date"], kind="mergesort")
+        stats = compute_stats(data, self.fighter_column)
+        logging.info(
+            "Computed {} stats in {:.2f}".format(len(stats), time.time() - start)
+        )
+        return stats
+
+    def transform(self):
+        """Transforms fight stats into sequences."""
+        if self.workers > 1:
+            return pd.DataFrame(self.transform_parallel())
+        return pd.DataFrame(nest_stats(self.transform_flat()))
+
+    def transform_shard(self, shard: Dict[str, np.ndarray]) -> List[Dict]:
+        """Computes stats for all fighters in a shard at once."""
+        self.data = pd.DataFrame(shard)
+        return nest_stats(self.transform_flat())
+
+
+CUMULATIVE_COLUMNS = [
+    "fighter.cumulative.{}.{}.{}".format(placement, result, method)
+    for placement in RESULTS
+    for result in RESULTS
+    for method in METHODS
+]
+
+
+def flatten_history(data: pd.DataFrame, side: str = "opponent") -> pd.DataFrame:
+    """Flattens win and loss history from nested stats dicts into columns.
+
+    Args:
+        data (pd.DataFrame): data with nested stats dicts.
+        side (str, optional): column with stats dicts. Defaults to "opponent".
+
+    Returns:
+        pd.DataFrame: history columns, like opponent.history.win.total.
+    """
+    histories = [stats["history"] for stats in data[side]]
+    return pd.DataFrame(
+        {
+            "{}.history.{}.{}".format(side, result, method): np.array(
+                [history[result][method] for history in histories], dtype=float
+            )
+            for result in RESULTS
+            for method in METHODS
+        },
+        index=data.index,
+    )
+
+
+def opponents_history(history: pd.DataFrame, results: pd.Series) -> pd.DataFrame:
+    """Splits opponents' history of every fight by the fighter's result,
+    so each row holds what the fight adds to cumulative stats.
+
+    Args:
+        history (pd.DataFrame): flat opponents' history columns.
+        results (pd.Series): fighter's result of every fight.
+
+    Returns:
+        pd.DataFrame: flat cumulative stats columns of single fights.
+    """
+    is_win = results.str.lower().to_numpy() == "win"
+    columns = {}
+    for placement, mask in [("win", is_win), ("loss", ~is_win)]:
+        for result in RESULTS:
+            for method in METHODS:
+                values = history["opponent.history.{}.{}".format(result, method)]
+                column = "fighter.cumulative.{}.{}.{}".format(placement, result, method)
+                columns[column] = np.where(mask, values.to_numpy(), 0.0)
+    return pd.DataFrame(columns, index=history.index)
+
+
+def previous_sums(frame: pd.DataFrame, fighters: np.ndarray) -> pd.DataFrame:
+    """Sums every column over all previous fights of a fighter.
+
+    Args:
+        frame (pd.DataFrame): values sorted by fighter and date.
+        fighters (np.ndarray): fighter's id of every row.
+
+    Returns:
+        pd.DataFrame: sums of values before every fight.
+    """
+    starts = group_starts(fighters)
+    groups = np.cumsum(starts) - 1
+    return pd.DataFrame(
+        {
+            column: previous_sum(frame[column].to_numpy(), groups, starts)
+            for column in frame.columns
+        },
+        index=frame.index,
+    )
+
+
+def compute_cumulative(data: pd.DataFrame, fighter_column: str = "fighterid") -> pd.DataFrame:
+    """Computes cumulative history of beaten opponents and opponents
+    the fighter lost to, before every fight.
+
+    Args:
+        data (pd.DataFrame): exchanged stats sorted by fighter and date.
+        fighter_column (str, optional): column with fighter's id.
+            Defaults to "fighterid".
+
+    Returns:
+        pd.DataFrame: flat cumulative stats columns.
+    """
+    fights = opponents_history(flatten_history(data), data["result"])
+    return previous_sums(fights, data[fighter_column].to_numpy())
+
+
+class VectorizedCumulator(Cumulator):
+    """Builds cumulative stats of fighters' opponents with grouped
+    cumulative sums over a flattened opponents' history."""
+
+    def transform_flat(self) -> pd.DataFrame:
+        """Transforms stats into flat cumulative stats columns,
+        along with fight id, fighter's id and date."""
+        data = self.sort_fights()
+        cumulative = compute_cumulative(data, self.fighter_column)
+        return pd.concat([data[["id", self.fighter_column, "date"]], cumulative], axis=1)
+
+    def transform(self):
+        """Transforms fight stats into sequences."""
+        if self.workers > 1:
+            return pd.DataFrame(self.transform_parallel())
+        start = time.time()
+        data = self.sort_fights()
+        cumulative = compute_cumulative(data, self.fighter_column).to_numpy()
+        transformed = []
+        for fight, counters in zip(data.to_dict("records"), cumulative):
+            fight["fighter"] = dict(fight["fighter"])
+            fight["fighter"]["cumulative"] = CumulativeStat(array("d", counters)).to_dict()
+            transformed.append(fight)
+        logging.info(
+            "Accumulated {} stats in {:.2f}".format(len(transformed), time.time() - start)
+        )
+        return pd.DataFrame(transformed)
+
+    def transform_shard(self, shard: Dict[str, np.ndarray]) -> List[Dict]:
+        """Computes cumulative stats for all fighters in a shard at once."""
+        self.data = pd.DataFrame(shard_rows(shard))
+        return self.transform().to_dict("records")
+
+    def snapshot(self) -> pd.DataFrame:
+        """Computes cumulative stats of every fighter
+        after his last fight.
+
+        Returns:
+            pd.DataFrame: flat cumulative stats indexed by fighter's id.
+        """
+        data = self.sort_fights()
+        fights = opponents_history(flatten_history(data), data["result"])
+        return fights.groupby(data[self.fighter_column].to_numpy(), sort=False).sum()
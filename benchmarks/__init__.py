@@ -0,0 +1 @@
+"""Benchmarks for measuring performance of the app."""
@@ -0,0 +1,111 @@
+"""Benchmarks whole crawls against a local stand-in server, so
+scraper changes can be compared offline. Every scenario runs in
+a new process, so its peak memory is measured alone.
+Run with: python -m benchmarks.crawl [pages...]
+"""
+import logging
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+from app.parsers import sherdog
+from app.service import services
+from app.tools import repository, scraper
+from app.tools.ratelimit import RateLimiter
+from tests.standin import StandinServer, lognormal_latency
+
+
+class RecordingLimiter(RateLimiter):
+    """Rate limiter that records the latency of every response."""
+
+    # Shared by all instances, as services create their own limiter
+    latencies: List[float] = []
+
+    async def release(self, url: str, status: Optional[int], latency: float) -> None:
+        self.latencies.append(latency)
+        await super().release(url, status, latency)
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Returns the value below which a share of values fall."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(share * len(ordered)), len(ordered) - 1)]
+
+
+def crawl_events(size: int, median: float, concurrency: int) -> Dict[str, Any]:
+    """Scrapes and parses event pages with scraper.run."""
+    with StandinServer(latency=lognormal_latency(median), variants=True) as server:
+        links = [server.url + "/events/event-{}".format(i) for i in range(size)]
+        limiter = RecordingLimiter(
+            rate=1000.0, burst=concurrency, concurrency=concurrency, max_concurrency=concurrency
+        )
+        with scraper.Scraper(limiter=limiter) as engine:
+            start = time.perf_counter()
+            engine.run(links, sherdog.extract_fights, concurrency)
+            elapsed = time.perf_counter() - start
+        return {"pages": server.requests, "seconds": elapsed}
+
+
+def crawl_fights(size: int, median: float, concurrency: int) -> Dict[str, Any]:
+    """Crawls listings and events with services.extract_fights,
+    with the rate limits used for sherdog.com."""
+    listings = max(size // 25, 1)
+    server = StandinServer(latency=lognormal_latency(median), variants=True, listings=listings)
+    with server, tempfile.TemporaryDirectory() as directory:
+        repo = repository.CSVRepository(directory + "/fights.csv", "id")
+        with mock.patch.object(services, "RateLimiter", RecordingLimiter):
+            start = time.perf_counter()
+            services.extract_fights(repo, base_url=server.url)
+            elapsed = time.perf_counter() - start
+        return {"pages": server.requests, "seconds": elapsed}
+
+
+def measure(scenario: Callable, *args) -> Dict[str, Any]:
+    """Runs a scenario and adds latencies and peak memory to its results."""
+    logging.getLogger().setLevel(logging.WARNING)
+    warnings.simplefilter("ignore", FutureWarning)
+    result = scenario(*args)
+    latencies = RecordingLimiter.latencies
+    result["p50"] = percentile(latencies, 0.5)
+    result["p99"] = percentile(latencies, 0.99)
+    # Kilobytes on Linux
+    result["rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def bench_crawls(sizes: List[int], median: float = 0.05, concurrency: int = 25) -> None:
+    """Reports throughput, latency and memory of crawl scenarios."""
+    context = multiprocessing.get_context("spawn")
+    print(
+        "{:>8} {:>10} {:>12} {:>8} {:>8} {:>8} {}".format(
+            "pages", "seconds", "pages/sec", "p50 ms", "p99 ms", "rss MB", "scenario"
+        )
+    )
+    for size in sizes:
+        for scenario in [crawl_events, crawl_fights]:
+            with ProcessPoolExecutor(1, mp_context=context) as pool:
+                result = pool.submit(measure, scenario, size, median, concurrency).result()
+            print(
+                "{:>8} {:>10.3f} {:>12.1f} {:>8.1f} {:>8.1f} {:>8.1f} {}".format(
+                    result["pages"],
+                    result["seconds"],
+                    result["pages"] / result["seconds"],
+                    result["p50"] * 1000,
+                    result["p99"] * 1000,
+                    result["rss"],
+                    scenario.__name__,
+                )
+            )
+
+
+if __name__ == "__main__":
+    SIZES = [int(arg) for arg in sys.argv[1:]] or [100, 500]
+    bench_crawls(SIZES)
@@ -0,0 +1,71 @@
+"""Benchmarks parsers on sample pages from tests/data/sherdog.
+Run with: python -m benchmarks.parsers [repeats]
+"""
+import sys
+import time
+from typing import Callable
+
+from app.parsers import sherdog
+from tests.conftest import get_path
+
+EVENT_URL = "http://www.sherdog.com/events/UFC-214-Cormier-vs-Jones-2-57825"
+FIGHTER_URL = "http://www.sherdog.com/fighter/Jon-Jones-27944"
+
+
+def read_page(path: str) -> str:
+    """Reads a sample page."""
+    with open(get_path(path)) as input_file:
+        return input_file.read()
+
+
+def timeit(func: Callable, repeats: int) -> float:
+    """Returns mean seconds of a call of func."""
+    func()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+def bench_event(repeats: int) -> None:
+    """Compares parsing an event page into a tree for every
+    extractor with sharing one tree between them."""
+    content = read_page("data/sherdog/event.html")
+
+    def tree_per_extractor():
+        # How extract_fights parsed event pages before
+        sherdog.extract_event_data(content, EVENT_URL)
+        sherdog.extract_fights(content, EVENT_URL)
+
+    modes = [
+        ("build tree", lambda: sherdog.parse_document(content)),
+        ("tree per extractor", tree_per_extractor),
+        ("shared tree", lambda: sherdog.extract_fights(content, EVENT_URL)),
+    ]
+    for mode, func in modes:
+        print("{:<24} {:>10.1f} ms  event".format(mode, timeit(func, repeats) * 1000))
+
+
+def bench_fighter(repeats: int) -> None:
+    """Compares extracting fighter info and fight history
+    from separate trees and from one tree."""
+    content = read_page("data/sherdog/fighter.html")
+
+    def tree_per_extractor():
+        sherdog.extract_fighter_info(content, FIGHTER_URL)
+        sherdog.extract_fighter_fights(content, FIGHTER_URL)
+
+    def shared_tree():
+        soup = sherdog.parse_document(content)
+        sherdog.extract_fighter_info(soup, FIGHTER_URL)
+        sherdog.extract_fighter_fights(soup, FIGHTER_URL)
+
+    modes = [("tree per extractor", tree_per_extractor), ("shared tree", shared_tree)]
+    for mode, func in modes:
+        print("{:<24} {:>10.1f} ms  fighter".format(mode, timeit(func, repeats) * 1000))
+
+
+if __name__ == "__main__":
+    REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    bench_event(REPEATS)
+    bench_fighter(REPEATS)
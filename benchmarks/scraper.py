@@ -0,0 +1,155 @@
+"""Benchmarks the scraper against a local stand-in server.
+Run with: python -m benchmarks.scraper [pages...]
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+from app.parsers import sherdog
+from app.tools import scraper
+from app.tools.ratelimit import RateLimiter, RetryPolicy
+from tests.standin import StandinServer, skewed_latency
+
+
+def content_size(content: bytes, url: str) -> Dict[str, Any]:
+    """Cheap parser, so only fetching is measured."""
+    return {"url": url, "size": len(content)}
+
+
+def scrape_with_new_sessions(links: List[str], batch_size: int) -> None:
+    """Scrapes every batch within a new session, so
+    connections are opened again for every batch."""
+    loop = asyncio.new_event_loop()
+    for current, _ in scraper.batch(links, batch_size):
+        loop.run_until_complete(scraper.scrape(current, content_size))
+    loop.close()
+
+
+def scrape_with_shared_session(links: List[str], batch_size: int) -> None:
+    """Scrapes all batches within one long-lived session."""
+    with scraper.Scraper(limit_per_host=batch_size) as engine:
+        engine.run_batches(links, content_size, batch_size)
+
+
+def bench_sessions(sizes: List[int], batch_size: int = 25) -> None:
+    """Shows the cost of opening connections for every batch."""
+    print(
+        "{:>8} {:>10} {:>12} {:>12} {}".format(
+            "pages", "seconds", "pages/sec", "connections", "mode"
+        )
+    )
+    for size in sizes:
+        for func in [scrape_with_new_sessions, scrape_with_shared_session]:
+            with StandinServer(latency=0.005) as server:
+                links = [server.url + "/fighter/fighter-{}".format(i) for i in range(size)]
+                start = time.perf_counter()
+                func(links, batch_size)
+                elapsed = time.perf_counter() - start
+                connections = len(server.connections)
+            print(
+                "{:>8} {:>10.3f} {:>12.1f} {:>12} {}".format(
+                    size, elapsed, size / elapsed, connections, func.__name__
+                )
+            )
+
+
+def bench_window(sizes: List[int], concurrency: int = 25) -> None:
+    """Compares lockstep batches with a sliding window of requests,
+    when a few pages are much slower than the rest."""
+    print("{:>8} {:>10} {:>12} {}".format("pages", "seconds", "pages/sec", "mode"))
+    for size in sizes:
+        for mode in ["run_batches", "run"]:
+            with StandinServer(latency=skewed_latency()) as server:
+                links = [server.url + "/fighter/fighter-{}".format(i) for i in range(size)]
+                with scraper.Scraper(limit_per_host=concurrency) as engine:
+                    start = time.perf_counter()
+                    getattr(engine, mode)(links, content_size, concurrency)
+                    elapsed = time.perf_counter() - start
+            print("{:>8} {:>10.3f} {:>12.1f} {}".format(size, elapsed, size / elapsed, mode))
+
+
+def bench_parsing(sizes: List[int], concurrency: int = 25) -> None:
+    """Compares parsing event pages in the event loop with parsing
+    them in worker processes while the next pages are fetched."""
+    workers = os.cpu_count() or 1
+    print("{:>8} {:>10} {:>12} {:>8}".format("pages", "seconds", "pages/sec", "workers"))
+    for size in sizes:
+        for parse_workers in [0, workers]:
+            with StandinServer(latency=0.02) as server:
+                links = [server.url + "/events/event-{}".format(i) for i in range(size)]
+                with scraper.Scraper(parse_workers=parse_workers) as engine:
+                    start = time.perf_counter()
+                    engine.run(links, sherdog.extract_fights, concurrency)
+                    elapsed = time.perf_counter() - start
+            print(
+                "{:>8} {:>10.3f} {:>12.1f} {:>8}".format(
+                    size, elapsed, size / elapsed, parse_workers
+                )
+            )
+
+
+def bench_throttling(sizes: List[int], concurrency: int = 25) -> None:
+    """Compares retrying throttled requests at a fixed concurrency
+    with pacing them by an adaptive rate limiter."""
+    print("{:>8} {:>10} {:>12} {:>8} {}".format("pages", "seconds", "pages/sec", "429s", "mode"))
+    for size in sizes:
+        for mode in ["fixed", "adaptive"]:
+            limiter = RateLimiter(rate=200.0, burst=25, concurrency=5) if mode == "adaptive" else None
+            with StandinServer(latency=0.01, rate=100.0, burst=20, retry_after=1) as server:
+                links = [server.url + "/fighter/fighter-{}".format(i) for i in range(size)]
+                policy = RetryPolicy(retries=20, base=0.1, seed=1)
+                with scraper.Scraper(limiter=limiter, policy=policy) as engine:
+                    start = time.perf_counter()
+                    engine.run(links, content_size, concurrency)
+                    elapsed = time.perf_counter() - start
+                throttled = server.statuses[429]
+            print(
+                "{:>8} {:>10.3f} {:>12.1f} {:>8} {}".format(
+                    size, elapsed, size / elapsed, throttled, mode
+                )
+            )
+
+
+def listed_events(content: bytes, url: str) -> List[str]:
+    """Lists 25 synthetic events on every listing page."""
+    page = int(url.rsplit("/", 1)[-1].split("-")[0])
+    base = url.split("/events/")[0]
+    return [base + "/events/event-{}".format(page * 25 + i) for i in range(25)]
+
+
+def bench_discovery(pages: List[int], concurrency: int = 25) -> None:
+    """Compares fetching listing pages one by one, each followed by
+    its events, with discovering events while they're fetched."""
+    print("{:>8} {:>10} {:>12} {}".format("listings", "seconds", "pages/sec", "mode"))
+    for size in pages:
+        for mode in ["sequential", "pipelined"]:
+            with StandinServer(latency=0.1) as server:
+                listings = [
+                    server.url + "/events/recent/{}-page".format(i) for i in range(1, size + 1)
+                ]
+                with scraper.Scraper() as engine:
+                    start = time.perf_counter()
+                    if mode == "sequential":
+                        for listing in listings:
+                            content = scraper.get_content(listing)
+                            engine.run(listed_events(content, listing), content_size, concurrency)
+                    else:
+                        events = engine.discover(listings, listed_events, 5)
+                        for _ in engine.records(events, content_size, concurrency):
+                            pass
+                    elapsed = time.perf_counter() - start
+                requests = server.requests
+            print("{:>8} {:>10.3f} {:>12.1f} {}".format(size, elapsed, requests / elapsed, mode))
+
+
+if __name__ == "__main__":
+    SIZES = [int(arg) for arg in sys.argv[1:]] or [250, 1000]
+    logging.getLogger().setLevel(logging.WARNING)
+    bench_sessions(SIZES)
+    bench_window(SIZES)
+    bench_parsing([size // 5 for size in SIZES])
+    bench_throttling(SIZES)
+    bench_discovery([size // 25 for size in SIZES])
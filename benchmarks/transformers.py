@@ -0,0 +1,156 @@
+"""Benchmarks transformers on synthetic data.
+Run with: python -m benchmarks.transformers [sizes...]
+"""
+import datetime as dt
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from app.transformers.lookup import AsOfIndex
+from app.transformers.sherdog import Cumulator, Sequencer
+from app.transformers.vectorized import VectorizedSequencer
+
+
+def generate_points(size: int) -> List[Dict]:
+    """Generates synthetic transformed data points,
+    two data points per fight.
+
+    Args:
+        size (int): number of data points.
+
+    Returns:
+        List[Dict]: data points in a shuffled order.
+    """
+    points = []
+    for i in range(size):
+        fight = i // 2
+        points.append({"id": "fight-{}".format(fight), "fighter": {"id": i}})
+    # Spread the perspectives of a fight apart
+    return points[::2] + points[1::2]
+
+
+def generate_fights(size: int, fighters: int) -> pd.DataFrame:
+    """Generates synthetic raw fights between a given number of fighters.
+
+    Args:
+        size (int): number of fights.
+        fighters (int): number of fighters.
+
+    Returns:
+        pd.DataFrame: fights data.
+    """
+    rand = random.Random(42)
+    start = dt.date(1995, 1, 1)
+    methods = ["decision", "ko", "tko", "submission"]
+    records = []
+    for i in range(size):
+        fighter, opponent = rand.sample(range(fighters), 2)
+        date = start + dt.timedelta(days=rand.randrange(9000))
+        records.append(
+            {
+                "id": "fight-{}".format(i),
+                "date": date.isoformat(),
+                "location": "location",
+                "organization": "organization",
+                "title": "event-{}".format(i // 10),
+                "fighter": "fighter-{}".format(fighter),
+                "opponent": "fighter-{}".format(opponent),
+                "result": "win",
+                "method": rand.choice(methods),
+                "details": "details",
+                "rounds": 3,
+                "time": rand.uniform(0.1, 15.0),
+                "position": rand.randrange(1, 12),
+            }
+        )
+    return pd.DataFrame(records)
+
+
+def measure(func: Callable, size: int) -> float:
+    """Measures time in seconds of running func on data of a given size."""
+    data = generate_points(size)
+    start = time.perf_counter()
+    func(data)
+    return time.perf_counter() - start
+
+
+def bench_exchange(sizes: List[int]) -> None:
+    """Shows how exchanging stats scales with number of data points."""
+    print("{:>10} {:>10} {:>14}".format("records", "seconds", "us per record"))
+    for size in sizes:
+        elapsed = measure(Sequencer.exchange, size)
+        print("{:>10} {:>10.3f} {:>14.3f}".format(size, elapsed, elapsed / size * 1e6))
+
+
+def bench_transform(sizes: List[int]) -> None:
+    """Shows how sequencing scales with number of fights,
+    when the average number of fights per fighter is constant."""
+    print(
+        "{:>10} {:>10} {:>10} {:>14} {}".format(
+            "fights", "fighters", "seconds", "us per fight", "transformer"
+        )
+    )
+    for size in sizes:
+        fighters = max(size // 5, 2)
+        data = generate_fights(size, fighters)
+        for sequencer in [Sequencer(), VectorizedSequencer()]:
+            start = time.perf_counter()
+            sequencer.fit_transform(data)
+            elapsed = time.perf_counter() - start
+            print(
+                "{:>10} {:>10} {:>10.3f} {:>14.3f} {}".format(
+                    size, fighters, elapsed, elapsed / size * 1e6,
+                    type(sequencer).__name__,
+                )
+            )
+
+
+def bench_build_stats(size: int) -> None:
+    """Shows time and memory of building stats for a single
+    fighter with a long history."""
+    data = generate_fights(size, 2)
+    for transformer in [Sequencer(), Cumulator()]:
+        if isinstance(transformer, Cumulator):
+            sequencer = Sequencer()
+            data = sequencer.exchange(sequencer.fit_transform(data))
+        transformer.fit(data)
+        _, fights = next(transformer.iter_fights())
+        tracemalloc.start()
+        start = time.perf_counter()
+        stats = transformer.build_stats(fights)
+        elapsed = time.perf_counter() - start
+        output, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            "{}: {:.1f} us, {:.0f} bytes peak, {:.0f} bytes output per fight".format(
+                type(transformer).__name__,
+                elapsed / len(stats) * 1e6,
+                peak / len(stats),
+                output / len(stats),
+            )
+        )
+
+
+def bench_lookup(size: int, card: int = 24) -> None:
+    """Shows time of looking up stats for a whole fight card."""
+    index = AsOfIndex.from_fights(generate_fights(size, max(size // 5, 2)))
+    fighters = list(index.fighters)[:card]
+    dates = [dt.date(2010, 1, 1)] * len(fighters)
+    repeats = 100
+    start = time.perf_counter()
+    for _ in range(repeats):
+        index.query(fighters, dates)
+    elapsed = (time.perf_counter() - start) / repeats
+    print("{} fighters looked up in {:.1f} us".format(len(fighters), elapsed * 1e6))
+
+
+if __name__ == "__main__":
+    SIZES = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    bench_exchange(SIZES)
+    bench_transform([size // 10 for size in SIZES])
+    bench_build_stats(SIZES[0] // 10)
+    bench_lookup(SIZES[0])
@@ -2,6 +2,8 @@
 import pytest
 import os
 
+import pandas as pd
+
 from tests import fakes
 
 
@@ -50,3 +52,40 @@ def sherdog_events_list(request):
 @pytest.fixture
 def fight_repository():
     return fakes.FakeRepository("id")
+
+
+@pytest.fixture
+def fights_data():
+    """Returns a small history of fights between a few fighters,
+    in the same shape as stored in the fights repository."""
+    fights = [
+        ("a", "b", "2010-01-10", "ko", "punches", 4.5, 1),
+        ("c", "d", "2010-01-10", "decision", "unanimous", 15.0, 2),
+        ("a", "c", "2010-05-02", "submission", "armbar", 3.2, 1),
+        ("d", "b", "2010-06-20", "tko", "knees", 7.0, 3),
+        ("b", "a", "2011-02-13", "decision", "split", 25.0, 1),
+        ("c", "d", "2011-02-13", "submission", "rear-naked choke", -1.0, 4),
+        ("a", "d", "2012-08-30", "decision", "unanimous", 15.0, 2),
+    ]
+    records = []
+    for i, (fighter, opponent, date, method, details, time, position) in enumerate(
+        fights
+    ):
+        records.append(
+            {
+                "id": "fight-{}".format(i),
+                "date": date,
+                "location": "Anaheim",
+                "organization": "UFC",
+                "title": "UFC {}".format(i),
+                "fighter": fighter,
+                "opponent": opponent,
+                "result": "win",
+                "method": method,
+                "details": details,
+                "rounds": 3,
+                "time": time,
+                "position": position,
+            }
+        )
+    return pd.DataFrame(records)
@@ -1,4 +1,4 @@
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Set
 from app.tools import repository
 
 
@@ -7,6 +7,7 @@ class FakeRepository(repository.AbstractRepository):
         self.id_column = id_column
         self.data: List[Dict] = []
         self.commited = False
+        self.commits = 0
 
     def _get(self, identifier: str) -> Optional[Dict]:
         for item in self.data:
@@ -14,9 +15,26 @@ class FakeRepository(repository.AbstractRepository):
                 return item
         return None
 
+    def _values(self, column: str) -> Set:
+        return {item[column] for item in self.data if column in item}
+
+    def _mapping(self, key: str, column: str) -> Dict[Any, Any]:
+        return {item[key]: item.get(column) for item in self.data if key in item}
+
     def _add(self, data: Dict) -> None:
         self.commited = False
         self.data.append(data)
 
+    def _replace(self, data: Dict, key: Optional[Sequence[str]] = None) -> None:
+        self.commited = False
+        columns = key or [self.id_column]
+        self.data = [
+            item
+            for item in self.data
+            if any(item.get(column) != data[column] for column in columns)
+        ]
+        self.data.append(data)
+
     def _commit(self):
-        self.commit = True
\ No newline at end of file
+        self.commited = True
+        self.commits += 1
\ No newline at end of file
@@ -644,4 +644,52 @@ def test_void_other_fighter():
     </td>
     """
     soup = BeautifulSoup(html, "lxml")
-    assert sherdog._extract_fighter_id(soup) == "Unknown Fighter"
\ No newline at end of file
+    assert sherdog._extract_fighter_id(soup) == "Unknown Fighter"
+
+
+def test_fighter_history_parsing(sherdog_fighter, sherdog_event):
+    fights = sherdog.extract_fighter_fights(*sherdog_fighter)
+    assert len(fights) == 28
+    assert fights[0] == {
+        "method": "decision",
+        "details": "unanimous",
+        "result": "win",
+        "rounds": 5,
+        "time": 25.0,
+        "fighter": "http://www.sherdog.com/fighter/Jon-Jones-27944",
+        "opponent": "http://www.sherdog.com/fighter/Dominick-Reyes-145941",
+        "position": 1,
+        "url": "http://www.sherdog.com/events/UFC-247-Jones-vs-Reyes-82427",
+        "title": "UFC 247 Jones vs. Reyes",
+        "organization": None,
+        "date": dt.date(2020, 2, 8),
+        "location": None,
+        "id": fights[0]["id"],
+    }
+    # Same id as the fight read from its event page
+    event_fights = sherdog.extract_fights(*sherdog_event)
+    history_ids = {fight["id"] for fight in fights}
+    assert event_fights[0]["id"] in history_ids
+    assert all(fight["result"] != "loss" for fight in fights)
+    # Fights other than main events have no position on the page
+    assert fights[-1]["title"] == "FFP Untamed 20"
+    assert fights[-1]["position"] == sherdog.HISTORY_POSITION
+
+
+def test_fight_ids_from_both_sides(sherdog_event):
+    fight = sherdog.extract_fights(*sherdog_event)[0]
+    swapped = dict(fight, fighter=fight["opponent"], opponent=fight["fighter"])
+    assert sherdog.fight_ids(fight) == tuple(reversed(sherdog.fight_ids(swapped)))
+    assert sherdog.fight_ids(fight)[0] == fight["id"]
+
+
+def test_extractors_share_a_parsed_document(sherdog_event, sherdog_fighter):
+    content, url = sherdog_event
+    soup = sherdog.parse_document(content)
+    assert sherdog.parse_document(soup) is soup
+    assert sherdog.extract_fights(soup, url) == sherdog.extract_fights(content, url)
+    assert sherdog.extract_event_data(soup, url) == sherdog.extract_event_data(content, url)
+    content, url = sherdog_fighter
+    soup = sherdog.parse_document(content)
+    assert sherdog.extract_fighter_info(soup, url) == sherdog.extract_fighter_info(content, url)
+    assert sherdog.extract_fighter_fights(soup, url) == sherdog.extract_fighter_fights(content, url)
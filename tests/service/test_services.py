@@ -0,0 +1,134 @@
+import math
+import time
+
+import pandas as pd
+
+from app.parsers import sherdog
+from app.service import services
+from app.tools.frontier import CrawlFrontier
+from app.transformers.incremental import transform_batch
+from tests.fakes import FakeRepository
+from tests.standin import StandinServer
+
+
+def test_records_are_committed_in_chunks_of_whole_pages(fight_repository):
+    records = [{"id": i} for i in range(5)]
+    pages = [("u1", records[:2]), ("u2", records[2:3]), ("u3", records[3:]), ("u4", [])]
+    frontier = CrawlFrontier()
+    for url, _ in pages:
+        frontier.add(url)
+    assert services.save_pages(iter(pages), fight_repository, 2, frontier) == 5
+    assert fight_repository.data == records
+    assert fight_repository.commits == 3
+    assert frontier.count()["done"] == 4
+
+
+def test_fighters_are_saved_as_they_are_scraped():
+    repo = FakeRepository("fighter")
+    with StandinServer() as server:
+        links = [server.url + "/fighter/fighter-{}".format(i) for i in range(5)]
+        services.extract_fighters(links + links[:2], repo, chunk_size=2)
+    assert server.requests == 5
+    assert sorted(fighter["fighter"] for fighter in repo.data) == sorted(links)
+    assert repo.commits == 3
+
+
+def test_incremental_crawl_stops_at_known_events(sherdog_events_list):
+    content, _ = sherdog_events_list
+    with StandinServer() as server:
+        listing = server.url + "/events/recent/1-page"
+        known = sherdog.extract_events_links(content, listing)
+        repo = FakeRepository("id")
+        repo.data = [{"id": i, "url": url} for i, url in enumerate(known)]
+        services.extract_fights(repo, base_url=server.url, incremental=True, overlap=2)
+    assert server.requests == 3
+    assert len(repo.data) == len(known)
+
+
+
+def test_fights_parsed_by_workers_are_the_same():
+    results = []
+    for parse_workers in [0, 2]:
+        with StandinServer(listings=1, events_per_listing=4) as server:
+            repo = FakeRepository("id")
+            services.extract_fights(
+                repo, base_url=server.url, incremental=True, parse_workers=parse_workers
+            )
+        results.append(sorted(fight["id"] for fight in repo.data))
+    assert results[0] == results[1]
+    assert len(results[0]) > 0
+
+def test_only_missing_and_stale_fighters_are_refreshed():
+    with StandinServer() as server:
+        links = [server.url + "/fighter/fighter-{}".format(i) for i in range(6)]
+        fights = FakeRepository("id")
+        fights.data = [
+            {"id": i, "fighter": links[i], "opponent": links[(i + 1) % 6]} for i in range(6)
+        ]
+        fights.data.append({"id": 6, "fighter": links[0], "opponent": "Unknown Fighter"})
+        now = time.time()
+        repo = FakeRepository("fighter")
+        repo.data = [
+            {"fighter": links[0], "fetched": now - 10},
+            {"fighter": links[1], "fetched": now - 10},
+            {"fighter": links[2], "fetched": now - 1000},
+            {"fighter": links[3]},
+        ]
+        services.refresh_fighters(fights, repo, ttl=100)
+    assert server.requests == 4
+    assert sorted(fighter["fighter"] for fighter in repo.data) == links
+    assert all(fighter["fetched"] >= now for fighter in repo.data[2:])
+    assert repo.commits == 1
+
+
+def test_backfill_requests_only_events_without_saved_fights(sherdog_event):
+    content, _ = sherdog_event
+    with StandinServer() as server:
+        event_url = server.url + "/events/UFC-214-Cormier-vs-Jones-2-57825"
+        repo = FakeRepository("id")
+        repo.data = sherdog.extract_fights(content, event_url)
+        fighter = server.url + "/fighter/Jon-Jones-27944"
+        history = sherdog.extract_fighter_fights(server.pages["fighter"], fighter)
+        events = {fight["url"] for fight in history}
+        services.backfill_fights(repo, [fighter], fetch_events=True)
+    # The fighter page, then every event except the saved one
+    assert server.requests == 1 + len(events) - 1
+    assert len(repo.data) == 12 + len(history) - 1
+    assert len({fight["id"] for fight in repo.data}) == len(repo.data)
+
+
+def test_backfill_without_events_saves_fights_of_fighter_pages():
+    with StandinServer() as server:
+        fighters = [server.url + "/fighter/Jon-Jones-27944"] * 2
+        repo = FakeRepository("id")
+        services.backfill_fights(repo, fighters, fetch_events=False)
+    assert server.requests == 2
+    assert len(repo.data) == 28
+    assert all(fight["organization"] is None for fight in repo.data)
+
+
+def test_backfilled_fights_can_be_transformed():
+    with StandinServer() as server:
+        repo = FakeRepository("id")
+        fighter = server.url + "/fighter/Jon-Jones-27944"
+        services.backfill_fights(repo, [fighter], fetch_events=False)
+    data = pd.DataFrame(repo.data)
+    data = data[data["result"].isin(["win", "loss"])]
+    results = transform_batch(data)
+    assert len(results) == 2 * len(data)
+    positions = [result["fighter"]["history"]["positions"] for result in results]
+    assert not any(math.isnan(position) for position in positions)
+    jones = [result for result in results if result["fighterid"].endswith("Jon-Jones-27944")]
+    assert max(result["fighter"]["history"]["positions"] for result in jones) > 0
+
+
+def test_recomputed_stats_replace_saved_ones(fights_data, tmp_path):
+    path = str(tmp_path / "states.pkl")
+    repo = FakeRepository("id")
+    old = fights_data.drop(index=2)
+    services.update_fights(old, old, repo, path)
+    services.update_fights(fights_data.loc[[2]], fights_data, repo, path)
+    keys = [(record["id"], record["fighterid"]) for record in repo.data]
+    assert len(keys) == len(set(keys)) == 2 * len(fights_data)
+    expected = {(r["id"], r["fighterid"]): r for r in transform_batch(fights_data)}
+    assert dict(zip(keys, repo.data)) == expected
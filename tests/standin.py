@@ -0,0 +1,245 @@
+"""Local stand-in for sherdog.com, serving sample pages
+from tests/data/sherdog under the same url layout, or synthetic
+variants of them, with configurable latency, errors and throttling.
+"""
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from collections import Counter
+from typing import Callable, Optional, Set, Tuple, Union
+
+from aiohttp import web
+
+from tests.conftest import get_path
+
+PAGES = {
+    "listing": "data/sherdog/events_list.html",
+    "event": "data/sherdog/event.html",
+    "fighter": "data/sherdog/fighter.html",
+}
+
+
+def classify_path(path: str) -> Optional[str]:
+    """Finds which kind of sample page is served under a path.
+
+    Args:
+        path (str): url path, like /events/recent/2-page.
+
+    Returns:
+        Optional[str]: listing, event, fighter or None.
+    """
+    if path.startswith("/events/recent/") and path.endswith("-page"):
+        return "listing"
+    if path.startswith("/events/"):
+        return "event"
+    if path.startswith("/fighter/"):
+        return "fighter"
+    return None
+
+
+def lognormal_latency(
+    median: float, sigma: float = 0.5, seed: int = 0
+) -> Callable[[str], float]:
+    """Returns latencies with a long tail, like those of a real site.
+
+    Args:
+        median (float): median seconds.
+        sigma (float, optional): spread of the tail. Defaults to 0.5.
+        seed (int, optional): seed of the latencies. Defaults to 0.
+
+    Returns:
+        Callable[[str], float]: latency of a requested path.
+    """
+    rand = random.Random(seed)
+    return lambda path: median * rand.lognormvariate(0.0, sigma)
+
+
+def skewed_latency(
+    slow: float = 0.5, share: float = 0.05, low: float = 0.01, high: float = 0.05, seed: int = 42
+) -> Callable[[str], float]:
+    """Returns latencies where a share of pages is much slower.
+
+    Args:
+        slow (float, optional): seconds of slow pages. Defaults to 0.5.
+        share (float, optional): share of slow pages. Defaults to 0.05.
+        low (float, optional): min seconds of other pages. Defaults to 0.01.
+        high (float, optional): max seconds of other pages. Defaults to 0.05.
+        seed (int, optional): seed of the latencies. Defaults to 42.
+
+    Returns:
+        Callable[[str], float]: latency of a requested path.
+    """
+    rand = random.Random(seed)
+
+    def latency(path: str) -> float:
+        return slow if rand.random() < share else rand.uniform(low, high)
+
+    return latency
+
+
+class StandinServer:
+    """Runs a local server in a background thread. Counts
+    opened connections, so reuse of connections can be checked."""
+
+    def __init__(
+        self,
+        latency: Union[float, Callable[[str], float]] = 0.0,
+        error_rate: float = 0.0,
+        rate: Optional[float] = None,
+        burst: int = 10,
+        retry_after: int = 1,
+        seed: int = 0,
+        variants: bool = False,
+        listings: int = 500,
+        events_per_listing: int = 25,
+    ) -> None:
+        """
+        Args:
+            latency (Union[float, Callable[[str], float]], optional): seconds
+                before every response, or a function of the requested path
+                returning them. Defaults to 0.0.
+            error_rate (float, optional): share of requests answered with 503.
+                Defaults to 0.0.
+            rate (Optional[float], optional): requests per second above which
+                clients are throttled with 429. Defaults to None, no throttling.
+            burst (int, optional): requests allowed at once when throttling.
+                Defaults to 10.
+            retry_after (int, optional): seconds sent in Retry-After of 429.
+                Defaults to 1.
+            seed (int, optional): seed of random errors. Defaults to 0.
+            variants (bool, optional): whether every event gets its own title,
+                so its fights are distinct, and listings link to synthetic
+                events. Defaults to False, the sample pages are served as is.
+            listings (int, optional): number of synthetic listing pages with
+                events, later pages are empty. Defaults to 500.
+            events_per_listing (int, optional): events on every synthetic
+                listing page. Defaults to 25.
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate = rate
+        self.burst = burst
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.variants = variants
+        self.listings = listings
+        self.events_per_listing = events_per_listing
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.pages = {}
+        for kind, path in PAGES.items():
+            with open(get_path(path), "rb") as input_file:
+                self.pages[kind] = input_file.read()
+        self.etags = {kind: self.get_etag(page) for kind, page in self.pages.items()}
+        self.connections: Set[Tuple] = set()
+        self.requests = 0
+        self.statuses: Counter = Counter()
+        self.url = ""
+        self._loop = asyncio.new_event_loop()
+        self._runner: Optional[web.AppRunner] = None
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    def __enter__(self) -> "StandinServer":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def start(self) -> str:
+        """Starts the server on a free port.
+
+        Returns:
+            str: base url of the server.
+        """
+        self._thread.start()
+        future = asyncio.run_coroutine_threadsafe(self._start(), self._loop)
+        port = future.result()
+        self.url = "http://127.0.0.1:{}".format(port)
+        return self.url
+
+    def stop(self) -> None:
+        """Stops the server and its thread."""
+        if self._runner is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _start(self) -> int:
+        app = web.Application()
+        app.router.add_get("/{path:.*}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        return self._runner.addresses[0][1]
+
+    def delay(self, request: web.Request) -> float:
+        """Returns seconds to wait before responding to a request."""
+        if callable(self.latency):
+            return self.latency(request.path)
+        return self.latency
+
+    def render(self, kind: str, path: str) -> bytes:
+        """Returns content of a page, a synthetic variant of the
+        sample page if variants are enabled."""
+        if not self.variants or kind == "fighter":
+            return self.pages[kind]
+        name = path.rstrip("/").rsplit("/", 1)[-1]
+        if kind == "event":
+            # Event title is part of fight ids
+            title = '<span itemprop="name">'.encode()
+            return self.pages[kind].replace(title, title + name.encode() + b" ", 1)
+        page = int(name.split("-")[0]) if name.split("-")[0].isdigit() else 0
+        links = ""
+        if 0 < page <= self.listings:
+            links = "".join(
+                '<a href="/events/event-{}-{}">Event</a>\n'.format(page, i)
+                for i in range(self.events_per_listing)
+            )
+        return "<html><body>\n{}</body></html>".format(links).encode()
+
+    def throttle(self) -> bool:
+        """Checks if a request is over the allowed rate."""
+        if self.rate is None:
+            return False
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return True
+        self.tokens -= 1
+        return False
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Responds with a sample page matching the requested path,
+        or with 304 if the client already has its current version."""
+        self.requests += 1
+        self.connections.add(request.transport.get_extra_info("peername"))
+        if self.throttle():
+            self.statuses[429] += 1
+            return web.Response(status=429, headers={"Retry-After": str(self.retry_after)})
+        await asyncio.sleep(self.delay(request))
+        if self.random.random() < self.error_rate:
+            self.statuses[503] += 1
+            return web.Response(status=503)
+        kind = classify_path(request.path)
+        if kind is None:
+            self.statuses[404] += 1
+            raise web.HTTPNotFound()
+        body = self.render(kind, request.path)
+        etag = self.etags[kind] if body is self.pages[kind] else self.get_etag(body)
+        headers = {"ETag": etag}
+        if request.headers.get("If-None-Match") == etag:
+            self.statuses[304] += 1
+            return web.Response(status=304, headers=headers)
+        self.statuses[200] += 1
+        return web.Response(body=body, content_type="text/html", headers=headers)
+
+    @staticmethod
+    def get_etag(body: bytes) -> str:
+        """Returns ETag of a page's content."""
+        return '"{}"'.format(hashlib.md5(body).hexdigest())
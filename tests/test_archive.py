@@ -0,0 +1,46 @@
+from app.parsers import sherdog
+from app.service import services
+from app.tools import scraper
+from app.tools.archive import HtmlArchive
+from tests.fakes import FakeRepository
+from tests.standin import StandinServer
+
+
+def test_pages_are_read_back_by_url(tmpdir):
+    with HtmlArchive(str(tmpdir)) as archive:
+        assert archive.append("http://a/1", b"first")
+        assert archive.append("http://a/2", b"second")
+        assert not archive.append("http://a/1", b"first")
+        assert archive.append("http://a/1", b"changed")
+        assert archive.get("http://a/1") == b"changed"
+        assert archive.get("http://a/3") is None
+    reopened = HtmlArchive(str(tmpdir))
+    assert len(reopened) == 2
+    assert reopened.get("http://a/2") == b"second"
+
+
+def test_segments_roll_over_at_size(tmpdir):
+    with HtmlArchive(str(tmpdir), segment_size=100) as archive:
+        for i in range(5):
+            archive.append("http://a/{}".format(i), bytes(range(i, 200 + i)))
+    reopened = HtmlArchive(str(tmpdir), segment_size=100)
+    paths = {path for path, _, _ in reopened.entries()}
+    assert len(paths) == 5
+    assert all(path.endswith(".seg.gz") for path in paths)
+    assert reopened.get("http://a/3") == bytes(range(3, 203))
+
+
+def test_fights_are_reparsed_from_archived_pages(tmpdir):
+    with StandinServer() as server:
+        links = [server.url + "/events/event-{}".format(i) for i in range(3)]
+        with HtmlArchive(str(tmpdir)) as archive:
+            with scraper.Scraper(archive=archive) as engine:
+                expected = engine.run(links, sherdog.extract_fights, 3)
+            archive.append(server.url + "/events/recent/1-page", b"<html></html>")
+            assert len(archive) == 4
+            repo = FakeRepository("id")
+            services.reparse_fights(archive, repo, chunk_size=10, workers=2)
+    assert server.requests == 3
+    assert sorted(fight["id"] for fight in repo.data) == sorted(
+        fight["id"] for fight in expected
+    )
@@ -0,0 +1,60 @@
+import os
+
+from app.tools import scraper
+from app.tools.cache import ResponseCache
+from tests.standin import StandinServer
+
+
+def content_size(content, url):
+    return {"url": url, "size": len(content)}
+
+
+def test_same_bodies_are_stored_once(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store("http://a/1", b"page", {"ETag": '"1"'})
+    cache.store("http://a/2", b"page", {})
+    assert len(os.listdir(os.path.join(str(tmp_path), "bodies"))) == 1
+    cached = cache.get("http://a/1")
+    assert cached.body == b"page"
+    assert cached.headers == {"ETag": '"1"'}
+    assert cache.get("http://a/3") is None
+
+
+def test_ttl_is_taken_from_the_first_matching_pattern(tmp_path):
+    cache = ResponseCache(
+        str(tmp_path), [(r"/events/recent/", 10.0), (r"/events/", 100.0)], 1.0
+    )
+    assert cache.get_ttl("http://www.sherdog.com/events/recent/2-page") == 10.0
+    assert cache.get_ttl("http://www.sherdog.com/events/UFC-1") == 100.0
+    assert cache.get_ttl("http://www.sherdog.com/fighter/Jon-Jones") == 1.0
+
+
+def test_validators_are_created_from_headers(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store("http://a/1", b"page", {"etag": '"1"', "Last-Modified": "yesterday"})
+    validators = ResponseCache.validators(cache.get("http://a/1"))
+    assert validators == {"If-None-Match": '"1"', "If-Modified-Since": "yesterday"}
+
+
+def test_stale_pages_are_revalidated(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    with StandinServer() as server:
+        links = [server.url + "/fighter/fighter-{}".format(i) for i in range(5)]
+        with scraper.Scraper(cache=cache) as engine:
+            first = engine.run(links, content_size, 5)
+            second = engine.run(links, content_size, 5)
+        content = scraper.get_content(links[0], cache)
+    assert server.statuses == {200: 5, 304: 6}
+    assert sorted(first, key=str) == sorted(second, key=str)
+    assert content.encode() == server.pages["fighter"]
+
+
+def test_fresh_pages_are_read_from_disk(tmp_path):
+    cache = ResponseCache(str(tmp_path), [(r"/fighter/", 3600.0)])
+    with StandinServer() as server:
+        links = [server.url + "/fighter/fighter-{}".format(i) for i in range(5)]
+        with scraper.Scraper(cache=cache) as engine:
+            engine.run(links, content_size, 5)
+            results = engine.run(links, content_size, 5)
+    assert server.requests == 5
+    assert len(results) == 5
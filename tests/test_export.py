@@ -0,0 +1,23 @@
+import numpy as np
+
+from app.transformers.export import FEATURE_COLUMNS, export_features, load_features
+from app.transformers.incremental import transform_batch
+
+
+def test_exported_features_can_be_loaded(fights_data, tmp_path):
+    records = transform_batch(fights_data)
+    rows = export_features([records[:5], records[5:]], str(tmp_path))
+    features, columns, labels, dates = load_features(str(tmp_path))
+    assert rows == len(records)
+    assert isinstance(features, np.memmap)
+    assert features.dtype == np.float32
+    assert features.shape == (len(records), len(FEATURE_COLUMNS))
+    assert columns == FEATURE_COLUMNS
+    record = records[7]
+    row = features[7]
+    assert row[columns.index("fighter.history.fights")] == record["fighter"]["history"]["fights"]
+    assert row[columns.index("opponent.cumulative.win.loss.knockout")] == (
+        record["opponent"]["cumulative"]["win"]["loss"]["knockout"]
+    )
+    assert labels[7] == (record["result"] == "win")
+    assert dates[7] == np.datetime64(record["date"])
@@ -0,0 +1,77 @@
+import pytest
+
+from app.service import services
+from app.tools.frontier import CrawlFrontier
+from tests.fakes import FakeRepository
+from tests.standin import StandinServer
+
+
+class CrashingRepository(FakeRepository):
+    def __init__(self, id_column, limit):
+        super().__init__(id_column)
+        self.limit = limit
+
+    def _add(self, data):
+        if len(self.data) == self.limit:
+            raise RuntimeError("Crashed")
+        super()._add(data)
+
+
+def test_interrupted_crawl_resumes(tmp_path):
+    path = str(tmp_path / "crawl.jsonl")
+    frontier = CrawlFrontier.load(path, done={"http://a/0"})
+    for url in ["http://a/0", "http://a/1", "http://a/2", "http://a/3"]:
+        frontier.add(url)
+    frontier.start("http://a/1")
+    frontier.start("http://a/2")
+    frontier.finish("http://a/1")
+    frontier.fail("http://a/3", "status 404")
+    frontier.checkpoint()
+    frontier.start("http://a/unknown")
+
+    resumed = CrawlFrontier.load(path, done={"http://a/0"})
+    assert resumed.states == {
+        "http://a/0": "done",
+        "http://a/1": "done",
+        "http://a/2": "queued",
+        "http://a/3": "failed",
+    }
+    assert resumed.pending() == ["http://a/2"]
+    retried = CrawlFrontier.load(path, retry_failed=True)
+    assert retried.pending() == ["http://a/2", "http://a/3"]
+
+
+def test_fighters_are_not_fetched_again_after_a_crash(tmp_path):
+    path = str(tmp_path / "crawl.jsonl")
+    with StandinServer() as server:
+        links = [server.url + "/fighter/fighter-{}".format(i) for i in range(6)]
+        crashing = CrashingRepository("fighter", 2)
+        with pytest.raises(RuntimeError):
+            services.extract_fighters(links, crashing, chunk_size=1, checkpoint=path)
+        before = server.requests
+
+        repo = FakeRepository("fighter")
+        repo.data = list(crashing.data)
+        services.extract_fighters(links, repo, chunk_size=1, checkpoint=path)
+        assert server.requests - before == 4
+
+        services.extract_fighters(links, repo, chunk_size=1, checkpoint=path)
+        assert server.requests - before == 4
+    assert sorted(fighter["fighter"] for fighter in repo.data) == sorted(links)
+
+
+def test_failed_fighters_are_fetched_again_on_request(tmp_path):
+    path = str(tmp_path / "crawl.jsonl")
+    with StandinServer() as server:
+        links = [server.url + "/fighter/fighter-{}".format(i) for i in range(2)]
+        frontier = CrawlFrontier.load(path)
+        frontier.add(links[0])
+        frontier.fail(links[0], "status 503")
+        frontier.checkpoint()
+
+        repo = FakeRepository("fighter")
+        services.extract_fighters(links, repo, checkpoint=path)
+        assert server.requests == 1
+        services.extract_fighters(links, repo, checkpoint=path, retry_failed=True)
+        assert server.requests == 2
+    assert sorted(fighter["fighter"] for fighter in repo.data) == sorted(links)
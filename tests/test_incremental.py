@@ -0,0 +1,69 @@
+from app.transformers.incremental import IncrementalTransformer, transform_batch
+
+
+def by_key(records):
+    return {(record["id"], record["fighterid"]): record for record in records}
+
+
+def test_incremental_matches_batch(fights_data):
+    expected = by_key(transform_batch(fights_data))
+    actual = by_key(IncrementalTransformer().update(fights_data))
+    assert actual == expected
+
+
+def test_process_pool_matches_vectorized(fights_data):
+    expected = by_key(transform_batch(fights_data))
+    assert by_key(transform_batch(fights_data, workers=2)) == expected
+
+
+def test_updating_with_new_fights(fights_data):
+    old, new = fights_data.iloc[:5], fights_data.iloc[5:]
+    transformer = IncrementalTransformer()
+    transformer.update(old)
+    actual = by_key(transformer.update(new))
+    expected = by_key(transform_batch(fights_data))
+    assert set(actual) == {("fight-5", "c"), ("fight-5", "d"), ("fight-6", "a"), ("fight-6", "d")}
+    assert actual == {key: expected[key] for key in actual}
+
+
+def test_out_of_order_fights_are_recomputed(fights_data):
+    old = fights_data.drop(index=2)
+    new = fights_data.loc[[2]]
+    transformer = IncrementalTransformer()
+    transformer.update(old)
+    actual = by_key(transformer.update(new, fights_data))
+    expected = by_key(transform_batch(fights_data))
+    # Both fighters are recomputed since the late fight
+    assert ("fight-4", "a") in actual
+    assert ("fight-5", "c") in actual
+    assert actual == {key: expected[key] for key in actual}
+    # Further updates continue from recomputed state
+    assert transformer.states["a"].stat.date == expected[("fight-6", "a")]["date"]
+
+
+def test_opponents_are_refreshed_after_recompute(fights_data):
+    later = fights_data.loc[[6]].assign(
+        id="fight-7", date="2013-01-05", fighter="d", opponent="b"
+    )
+    full = fights_data.append(later, ignore_index=True)
+    transformer = IncrementalTransformer()
+    transformer.update(fights_data.drop(index=2))
+    recomputed = by_key(transformer.update(fights_data.loc[[2]], fights_data))
+    expected = by_key(transform_batch(full))
+    # Opponents who fought a or c after the late fight are stale too
+    assert ("fight-4", "b") in recomputed
+    assert ("fight-5", "d") in recomputed
+    assert recomputed == {key: expected[key] for key in recomputed}
+    actual = by_key(transformer.update(later))
+    assert actual == {key: expected[key] for key in actual}
+
+
+def test_states_are_saved_and_loaded(fights_data, tmp_path):
+    path = str(tmp_path / "states.pkl")
+    transformer = IncrementalTransformer.load(path)
+    transformer.update(fights_data.iloc[:5])
+    transformer.save(path)
+    loaded = IncrementalTransformer.load(path)
+    expected = by_key(transform_batch(fights_data))
+    actual = by_key(loaded.update(fights_data.iloc[5:]))
+    assert actual == {key: expected[key] for key in actual}
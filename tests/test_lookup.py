@@ -0,0 +1,38 @@
+import datetime as dt
+
+from app.transformers.export import STATS_COLUMNS
+from app.transformers.incremental import transform_batch
+from app.transformers.lookup import AsOfIndex
+
+
+def test_lookup_before_a_known_fight(fights_data):
+    index = AsOfIndex.from_fights(fights_data)
+    records = transform_batch(fights_data)
+    record = [r for r in records if r["id"] == "fight-4" and r["fighterid"] == "a"][0]
+    stats = index.lookup("a", dt.date(2011, 2, 13))
+    assert stats["history.fights"] == record["fighter"]["history"]["fights"]
+    assert stats["history.since_last_fight"] == record["fighter"]["history"]["since_last_fight"]
+    assert stats["cumulative.win.win.total"] == (
+        record["fighter"]["cumulative"]["win"]["win"]["total"]
+    )
+
+
+def test_lookup_after_the_last_fight(fights_data):
+    index = AsOfIndex.from_fights(fights_data)
+    stats = index.lookup("a", dt.date(2013, 8, 30))
+    assert stats["history.fights"] == 4.0
+    assert stats["history.win.total"] == 3.0
+    assert stats["history.since_last_fight"] == 365
+    assert stats["streak.win"] == 1.0
+    assert stats["cumulative.win.win.total"] == 2.0
+    assert stats["cumulative.loss.loss.knockout"] == 2.0
+
+
+def test_querying_a_fight_card(fights_data):
+    index = AsOfIndex.from_fights(fights_data)
+    dates = [dt.date(2010, 1, 1), dt.date(2010, 6, 1), dt.date(2010, 6, 1)]
+    stats = index.query(["a", "a", "unknown"], dates)
+    assert stats.shape[0] == 3
+    assert stats[0].sum() == 0.0
+    assert stats[2].sum() == 0.0
+    assert stats[1][STATS_COLUMNS.index("history.win.total")] == 2.0
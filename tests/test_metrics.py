@@ -0,0 +1,40 @@
+from app.service import services
+from app.tools import scraper
+from app.tools.metrics import Histogram, RequestMetrics
+from app.tools.ratelimit import RetryPolicy
+from tests.standin import StandinServer
+
+
+def content_size(content, url):
+    return {"url": url, "size": len(content)}
+
+
+def test_histogram_estimates_percentiles():
+    histogram = Histogram(start=0.001, factor=2.0, size=10)
+    for value in [0.001] * 50 + [0.003] * 49 + [0.1]:
+        histogram.add(value)
+    assert histogram.count == 100
+    assert histogram.percentile(0.5) == 0.001
+    assert histogram.percentile(0.9) == 0.004
+    assert histogram.percentile(1.0) == 0.1
+    assert abs(histogram.mean() - 0.00297) < 1e-9
+
+
+def test_requests_are_measured_by_kind():
+    metrics = RequestMetrics(services.URL_KINDS)
+    with StandinServer(latency=0.02, error_rate=0.2, seed=1) as server:
+        links = [server.url + "/fighter/fighter-{}".format(i) for i in range(10)]
+        links.append(server.url + "/events/recent/1-page")
+        policy = RetryPolicy(retries=10, base=0.01, seed=1)
+        with scraper.Scraper(metrics=metrics, policy=policy) as engine:
+            engine.run(links, content_size, 5)
+    fighters = metrics.histograms["fighter"]
+    assert metrics.statuses["fighter"][200] == 10
+    assert metrics.statuses["listing"][200] == 1
+    assert metrics.retries["fighter"] + metrics.retries["listing"] == server.statuses[503]
+    assert metrics.bytes["fighter"] == 10 * len(server.pages["fighter"])
+    assert fighters["total"].count == sum(metrics.statuses["fighter"].values())
+    assert fighters["ttfb"].percentile(0.5) >= 0.02
+    assert fighters["parse"].count == 10
+    assert fighters["connect"].count >= 1
+    assert "fighter: " in metrics.summary()
@@ -0,0 +1,122 @@
+import asyncio
+import datetime as dt
+import email.utils
+import time
+
+from app.tools import scraper
+from app.tools.ratelimit import (
+    AdaptiveLimiter,
+    RateLimiter,
+    RetryPolicy,
+    TokenBucket,
+    parse_retry_after,
+)
+from tests.standin import StandinServer
+
+
+def content_size(content, url):
+    return {"url": url, "size": len(content)}
+
+
+def test_retry_after_is_parsed_from_seconds_and_dates():
+    future = dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=30)
+    assert parse_retry_after("3") == 3.0
+    assert 25 < parse_retry_after(email.utils.format_datetime(future)) <= 30
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_retries_back_off_with_jitter():
+    policy = RetryPolicy(retries=2, base=1.0, cap=3.0, seed=1)
+    assert 0.5 <= policy.delay(0) <= 1.0
+    assert 1.0 <= policy.delay(1) <= 2.0
+    assert 1.5 <= policy.delay(5) <= 3.0
+    assert policy.delay(0, retry_after=10.0) == 10.0
+    assert policy.should_retry(1, 503)
+    assert policy.should_retry(1, None)
+    assert not policy.should_retry(1, 404)
+    assert not policy.should_retry(2, 503)
+
+
+def test_limit_grows_additively_and_shrinks_multiplicatively():
+    async def scenario():
+        limiter = AdaptiveLimiter(limit=4, maximum=8, latency_target=1.0)
+        for _ in range(4):
+            await limiter.acquire()
+            await limiter.release(True, 0.1)
+        grown = limiter.limit
+        await limiter.acquire()
+        await limiter.release(False, 0.1)
+        halved = limiter.limit
+        await limiter.acquire()
+        await limiter.release(False, 0.1)
+        return grown, halved, limiter.limit
+
+    grown, halved, after_second_error = asyncio.run(scenario())
+    assert 4.9 < grown < 5.0
+    assert halved == grown / 2
+    # A second error within the same round trip doesn't shrink it again
+    assert after_second_error == halved
+
+
+def test_bucket_paces_requests():
+    async def scenario():
+        bucket = TokenBucket(rate=100.0, burst=1)
+        start = time.perf_counter()
+        for _ in range(6):
+            await bucket.take()
+        return time.perf_counter() - start
+
+    assert asyncio.run(scenario()) >= 0.045
+
+
+def test_cancelled_acquire_frees_its_slot():
+    async def scenario():
+        limiter = RateLimiter(rate=0.1, burst=1, concurrency=2)
+        await limiter.acquire("http://a/1")
+        waiting = asyncio.ensure_future(limiter.acquire("http://a/2"))
+        await asyncio.sleep(0.01)
+        host = limiter.get_host("http://a/2")
+        taken = limiter.limiters[host].active
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        return taken, limiter.limiters[host].active
+
+    assert asyncio.run(scenario()) == (2, 1)
+
+
+def test_throttled_requests_wait_for_retry_after():
+    with StandinServer(rate=50.0, burst=10, retry_after=1) as server:
+        links = [server.url + "/fighter/fighter-{}".format(i) for i in range(20)]
+        limiter = RateLimiter(rate=1000.0, burst=100, concurrency=20)
+        with scraper.Scraper(limiter=limiter, policy=RetryPolicy(seed=1)) as engine:
+            start = time.perf_counter()
+            results = engine.run(links, content_size, 20)
+            elapsed = time.perf_counter() - start
+    assert len(results) == 20
+    assert server.statuses[429] > 0
+    assert elapsed >= 1.0
+    host = limiter.get_host(links[0])
+    assert limiter.limiters[host].limit < 20
+    assert limiter.buckets[host].rate < 1000.0
+
+
+def test_failed_requests_are_retried():
+    with StandinServer(error_rate=0.3) as server:
+        links = [server.url + "/fighter/fighter-{}".format(i) for i in range(20)]
+        policy = RetryPolicy(retries=10, base=0.01, seed=1)
+        with scraper.Scraper(policy=policy) as engine:
+            results = engine.run(links, content_size, 5)
+    assert server.statuses[503] > 0
+    assert len(results) == 20
+    assert not engine.failed
+
+
+def test_pages_failed_without_retries_are_recorded():
+    with StandinServer(error_rate=0.3) as server:
+        links = [server.url + "/fighter/fighter-{}".format(i) for i in range(20)]
+        links.append(server.url + "/unknown")
+        with scraper.Scraper() as engine:
+            results = engine.run(links, content_size, 5)
+    assert len(results) + len(engine.failed) == 21
+    assert engine.failed[links[-1]] == "status 404"
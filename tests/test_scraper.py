@@ -1,4 +1,6 @@
+from app.parsers import sherdog
 from app.tools import scraper
+from tests.standin import StandinServer
 
 
 def test_how_batches_are_generated():
@@ -7,3 +9,103 @@ def test_how_batches_are_generated():
     assert batches[0] == ([0, 1, 2], 0)
     assert batches[1] == ([3, 4], 3)
     assert len(batches[0][0]) + len(batches[1][0]) == len(dataset)
+
+
+def content_size(content, url):
+    return {"url": url, "size": len(content)}
+
+
+def test_scraper_reuses_connections_between_batches():
+    with StandinServer() as server:
+        links = [server.url + "/fighter/fighter-{}".format(i) for i in range(20)]
+        with scraper.Scraper(limit_per_host=5) as engine:
+            results = engine.run(links, content_size, batch_size=5)
+    assert sorted(result["url"] for result in results) == sorted(links)
+    assert all(result["size"] == len(server.pages["fighter"]) for result in results)
+    assert server.requests == 20
+    assert len(server.connections) <= 5
+
+
+def slow_first_page(path):
+    return 0.5 if path.endswith("fighter-0") else 0.01
+
+
+def test_slow_page_does_not_hold_up_other_requests():
+    with StandinServer(latency=slow_first_page) as server:
+        links = [server.url + "/fighter/fighter-{}".format(i) for i in range(20)]
+        with scraper.Scraper() as engine:
+            results = engine.run(links, content_size, batch_size=4)
+    # Other pages are fetched while the slow page is in flight,
+    # instead of waiting for it with the rest of its batch
+    urls = [result["url"] for result in results]
+    assert urls[-1] == links[0]
+    assert sorted(urls[:-1]) == sorted(links[1:])
+
+
+def test_pages_parsed_by_workers_are_the_same():
+    with StandinServer() as server:
+        links = [server.url + "/events/event-{}".format(i) for i in range(6)]
+        with scraper.Scraper() as engine:
+            expected = engine.run(links, sherdog.extract_fights, 3)
+        with scraper.Scraper(parse_workers=2) as engine:
+            results = engine.run(links, sherdog.extract_fights, 3)
+    assert len(results) == len(expected) > 0
+    assert sorted(results, key=str) == sorted(expected, key=str)
+
+
+def test_records_are_yielded_as_pages_are_parsed():
+    with StandinServer() as server:
+        links = [server.url + "/fighter/fighter-{}".format(i) for i in range(5)]
+        with scraper.Scraper() as engine:
+            records = engine.records(links, content_size, 2)
+            first = next(records)
+            rest = list(records)
+    assert sorted(record["url"] for record in [first] + rest) == sorted(links)
+
+
+def test_discovered_links_are_fetched_once():
+    with StandinServer() as server:
+        listings = [server.url + "/events/recent/{}-page".format(i) for i in range(1, 4)]
+        known = {server.url + "/fighter/fighter-2"}
+
+        def links_on_page(content, url):
+            page = int(url.split("/")[-1].split("-")[0])
+            return [
+                server.url + "/fighter/fighter-{}".format(i)
+                for i in range(2 * page, 2 * page + 4)
+            ]
+
+        with scraper.Scraper() as engine:
+            links = engine.discover(listings, links_on_page, 2, known)
+            results = list(engine.records(links, content_size, 3))
+    urls = [result["url"] for result in results]
+    expected = [server.url + "/fighter/fighter-{}".format(i) for i in range(3, 10)]
+    assert sorted(urls) == sorted(expected)
+    assert server.requests == len(listings) + len(expected)
+
+
+def test_new_links_are_discovered_until_a_page_has_only_known_ones():
+    with StandinServer() as server:
+        listings = [server.url + "/events/recent/{}-page".format(i) for i in range(1, 10)]
+
+        def links_on_page(content, url):
+            page = int(url.split("/")[-1].split("-")[0])
+            return [server.url + "/events/event-{}".format(i) for i in range(page, page + 2)]
+
+        known = {server.url + "/events/event-{}".format(i) for i in range(3, 10)}
+        with scraper.Scraper() as engine:
+            links = list(engine.iterate(engine.discover_new(listings, links_on_page, known, 1)))
+    assert links == [server.url + "/events/event-1", server.url + "/events/event-2"]
+    # Page 1 lists new links, 2 doesn't, 3 is the overlap
+    assert server.requests == 3
+
+
+def test_synthetic_events_have_distinct_fights():
+    with StandinServer(variants=True, listings=2, events_per_listing=3) as server:
+        listings = [server.url + "/events/recent/{}-page".format(i) for i in range(1, 4)]
+        sample = sherdog.extract_fights(server.pages["event"], server.url + "/events/x")
+        with scraper.Scraper() as engine:
+            events = engine.discover(listings, sherdog.extract_events_links)
+            fights = list(engine.records(events, sherdog.extract_fights))
+    assert server.requests == 3 + 6
+    assert len({fight["id"] for fight in fights}) == len(fights) == 6 * len(sample)
@@ -0,0 +1,127 @@
+import datetime as dt
+
+from app.transformers.sherdog import Cumulator, FighterStat, Sequencer, group_by_id
+
+
+def test_grouping_by_id():
+    data = [{"id": 1, "x": "a"}, {"id": 2, "x": "b"}, {"id": 1, "x": "c"}]
+    groups = group_by_id(data)
+    assert list(groups.keys()) == [1, 2]
+    assert [point["x"] for point in groups[1]] == ["a", "c"]
+
+
+def test_exchange_pairs_fighter_and_opponent(fights_data):
+    sequences = Sequencer().fit_transform(fights_data)
+    exchanged = Sequencer.exchange(sequences)
+    assert len(exchanged) == 2 * len(fights_data)
+    for point in exchanged:
+        assert point["opponent"]["id"] != point["fighter"]["id"]
+    ids = {(point["id"], point["fighter"]["id"]) for point in exchanged}
+    assert ("fight-0", "a") in ids
+    assert ("fight-0", "b") in ids
+
+
+def test_exchange_skips_unpaired_points():
+    data = [
+        {"id": 1, "fighter": {"id": "a"}},
+        {"id": 1, "fighter": {"id": "b"}},
+        {"id": 2, "fighter": {"id": "c"}},
+    ]
+    exchanged = Sequencer.exchange(data)
+    assert [point["fighter"]["id"] for point in exchanged] == ["a", "b"]
+    assert exchanged[0]["opponent"] == {"id": "b"}
+
+
+def test_grouped_iteration_matches_per_fighter_lookup(fights_data):
+    sequencer = Sequencer()
+    sequencer.fit(fights_data)
+    grouped = dict(sequencer.iter_fights())
+    assert sorted(grouped.keys()) == sorted(sequencer.get_fighters())
+    for fighter, fights in grouped.items():
+        assert fights == sequencer.get_fights_for_fighter(fighter)
+
+
+def test_cumulator_transforms_every_data_point(fights_data):
+    sequencer = Sequencer()
+    exchanged = sequencer.exchange(sequencer.fit_transform(fights_data))
+    accumulated = Cumulator().fit_transform(exchanged)
+    assert len(accumulated) == len(exchanged)
+    dates = accumulated.groupby("fighterid")["date"].apply(list)
+    assert all(values == sorted(values) for values in dates)
+
+
+def test_sequencer_stats(fights_data):
+    stats = Sequencer().fit_transform(fights_data).to_dict("records")
+    last = [stat for stat in stats if stat["fighter"]["id"] == "d"][-1]
+    assert last["id"] == "fight-6"
+    assert last["date"] == dt.date(2012, 8, 30)
+    assert last["fighter"] == {
+        "started": "2010-01-10",
+        "id": "d",
+        "history": {
+            "win": {"total": 1.0, "decision": 0.0, "submission": 0.0, "knockout": 1.0},
+            "loss": {"total": 2.0, "decision": 1.0, "submission": 1.0, "knockout": 0.0},
+            "since_last_fight": 564,
+            "fights": 3.0,
+            "time": 27.0,
+            "positions": 9.0,
+        },
+        "streak": {"win": 0.0, "loss": 1.0},
+    }
+
+
+def test_advancing_stat_keeps_previous_counters(fights_data):
+    first, second = fights_data.to_dict("records")[:2]
+    stat = FighterStat(first, dt.date(2010, 1, 10), first["date"])
+    advanced = stat.advance(second, dt.date(2010, 2, 10))
+    assert advanced.counters is not stat.counters
+    assert stat.to_dict()["fighter"]["history"]["fights"] == 0.0
+    assert advanced.to_dict()["fighter"]["history"]["fights"] == 1.0
+    assert advanced.to_dict()["fighter"]["history"]["since_last_fight"] == 31
+
+
+def test_cumulator_stats(fights_data):
+    sequencer = Sequencer()
+    exchanged = sequencer.exchange(sequencer.fit_transform(fights_data))
+    accumulated = Cumulator().fit_transform(exchanged).to_dict("records")
+    last = [stat for stat in accumulated if stat["fighterid"] == "a"][-1]
+    empty = {"total": 0.0, "decision": 0.0, "submission": 0.0, "knockout": 0.0}
+    assert last["fighter"]["cumulative"] == {
+        "win": {
+            "win": {"total": 1.0, "decision": 1.0, "submission": 0.0, "knockout": 0.0},
+            "loss": empty,
+        },
+        "loss": {
+            "win": empty,
+            "loss": {"total": 2.0, "decision": 0.0, "submission": 0.0, "knockout": 2.0},
+        },
+    }
+    # Input data points are left untouched
+    assert all("cumulative" not in point["fighter"] for point in exchanged)
+
+
+def test_parallel_transform_matches_sequential(fights_data):
+    expected = Sequencer().fit_transform(fights_data)
+    actual = Sequencer(workers=2).fit_transform(fights_data)
+    assert actual.to_dict("records") == expected.to_dict("records")
+
+
+def test_shards_contain_whole_fighters(fights_data):
+    sequencer = Sequencer()
+    sequencer.fit(fights_data)
+    shards = sequencer.split_shards(3)
+    fighters = [set(shard["fighter"]) for shard in shards]
+    assert sum(len(shard["fighter"]) for shard in shards) == 2 * len(fights_data)
+    assert sum(len(names) for names in fighters) == len(set.union(*fighters))
+
+
+def test_cumulator_shards_have_numeric_stats(fights_data):
+    exchanged = Sequencer.exchange(Sequencer().fit_transform(fights_data))
+    cumulator = Cumulator()
+    cumulator.fit(exchanged)
+    shards = cumulator.split_shards(2)
+    assert "opponent" not in shards[0]
+    assert shards[0]["opponent.history.win.total"].dtype.kind == "f"
+    expected = cumulator.transform().to_dict("records")
+    actual = Cumulator(workers=2).fit_transform(exchanged).to_dict("records")
+    assert actual == expected
@@ -0,0 +1,25 @@
+import numpy as np
+
+from app.transformers.incremental import transform_batch
+from app.transformers.streaming import find_partners, iter_partitions, split_partitions
+
+
+def by_key(records):
+    return {(record["id"], record["fighterid"]): record for record in records}
+
+
+def test_finding_partners():
+    ids = np.array(["b", "a", "a", "b"], dtype=object)
+    assert find_partners(ids).tolist() == [3, 2, 1, 0]
+
+
+def test_partitions_contain_whole_fighters():
+    fighters = np.array(["a", "a", "b", "c", "c", "c", "d"], dtype=object)
+    assert split_partitions(fighters, 3) == [(0, 3), (3, 6), (6, 7)]
+
+
+def test_partitions_match_batch(fights_data):
+    partitions = list(iter_partitions(fights_data, 3))
+    assert len(partitions) > 1
+    actual = by_key([record for partition in partitions for record in partition])
+    assert actual == by_key(transform_batch(fights_data))
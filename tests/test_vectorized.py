@@ -0,0 +1,63 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+from app.parsers import sherdog
+from app.transformers.sherdog import Cumulator, Sequencer
+from app.transformers.vectorized import (
+    VectorizedCumulator,
+    VectorizedSequencer,
+    run_lengths,
+)
+
+
+def test_run_lengths():
+    starts = np.array([True, False, False, True, False])
+    assert run_lengths(starts).tolist() == [1, 2, 3, 1, 2]
+
+
+def test_vectorized_stats_match_sequencer(fights_data):
+    expected = Sequencer().fit_transform(fights_data)
+    actual = VectorizedSequencer().fit_transform(fights_data)
+    assert actual.to_dict("records") == expected.to_dict("records")
+
+
+def test_vectorized_stats_match_sequencer_for_event(sherdog_event):
+    fights = pd.DataFrame(sherdog.extract_fights(*sherdog_event))
+    fights = fights[fights["result"].isin(["win", "loss"])].copy()
+    fights["date"] = fights["date"].apply(dt.date.isoformat)
+    expected = Sequencer().fit_transform(fights)
+    actual = VectorizedSequencer().fit_transform(fights)
+    assert actual.to_dict("records") == expected.to_dict("records")
+
+
+def test_vectorized_cumulator_matches_cumulator(fights_data):
+    sequencer = Sequencer()
+    exchanged = sequencer.exchange(sequencer.fit_transform(fights_data))
+    expected = Cumulator().fit_transform(exchanged)
+    actual = VectorizedCumulator().fit_transform(exchanged)
+    assert actual.to_dict("records") == expected.to_dict("records")
+
+
+def test_vectorized_cumulator_has_no_state_between_calls(fights_data):
+    sequencer = Sequencer()
+    exchanged = sequencer.exchange(sequencer.fit_transform(fights_data))
+    cumulator = VectorizedCumulator()
+    first = cumulator.fit_transform(exchanged)
+    second = cumulator.fit_transform(exchanged)
+    assert first.to_dict("records") == second.to_dict("records")
+
+
+def test_cumulative_snapshot(fights_data):
+    sequencer = Sequencer()
+    exchanged = sequencer.exchange(sequencer.fit_transform(fights_data))
+    cumulator = VectorizedCumulator()
+    cumulator.fit(exchanged)
+    snapshot = cumulator.snapshot().loc["a"]
+    assert snapshot["fighter.cumulative.win.win.total"] == 2.0
+    assert snapshot["fighter.cumulative.win.win.decision"] == 1.0
+    assert snapshot["fighter.cumulative.win.win.knockout"] == 1.0
+    assert snapshot["fighter.cumulative.win.loss.total"] == 2.0
+    assert snapshot["fighter.cumulative.loss.win.total"] == 0.0
+    assert snapshot["fighter.cumulative.loss.loss.knockout"] == 2.0